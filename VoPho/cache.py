@@ -0,0 +1,407 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from importlib import metadata
+
+from .phonemizers import get_registration
+
+_fingerprints = {}
+
+
+def _distribution_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "0"
+
+
+def backend_fingerprint(lang):
+    """
+    Get a string identifying the versions of everything that shapes a language backend's output.
+
+    :param lang: Language code (e.g., 'en', 'ja', 'zh', 'cy')
+    :return: The fingerprint, e.g. "VoPho=0.0.19;misaki=0.5.6;openphonemizer=0.1.2"
+    """
+    registration = get_registration(lang) or {"distributions": (), "version": None}
+    memo_key = (lang, registration["distributions"], registration["version"])
+    if memo_key not in _fingerprints:
+        names = ('VoPho',) + registration["distributions"]
+        parts = [f"{name}={_distribution_version(name)}" for name in names]
+        if registration["version"] is not None:
+            parts.append(f"{lang}={registration['version']}")
+        _fingerprints[memo_key] = ";".join(parts)
+    return _fingerprints[memo_key]
+
+
+class SegmentCache:
+    """
+    An in-memory LRU cache of phonemized segments with hit, miss and eviction counters.
+
+    Reads take no lock, so threads sharing the cache never wait on each other to look segments up; writes
+    are serialised. The hit and miss counters may undercount slightly when many threads read at once.
+    """
+
+    def __init__(self, maxsize=4096):
+        """
+        :param maxsize: Maximum number of entries kept, the least recently used entry is evicted beyond it
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        # Each OrderedDict call is atomic under the GIL, a key evicted between the two calls just stays evicted
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return default
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def put_many(self, items):
+        for key, value in items:
+            self.put(key, value)
+
+    def items(self):
+        """
+        :return: A list of (key, value) pairs, least recently used first
+        """
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        :return: A dictionary with hits, misses, evictions, size, maxsize and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _connect(path, timeout, schema):
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(schema)
+    return conn
+
+
+class SqliteCache:
+    """
+    A persistent cache of phonemized segments stored in SQLite.
+
+    The database runs in WAL mode so many processes can read and write it at once, and every process
+    (and thread) opens its own connection on first use.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        """
+        :param path: Path to the database file, created if missing
+        :param timeout: Seconds to wait for another process holding a write lock
+        """
+        self.path = os.fspath(path)
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._connection()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            # Connections must not be shared with forked children
+            conn = _connect(self.path, self.timeout,
+                            "CREATE TABLE IF NOT EXISTS segments ("
+                            "lang TEXT, text TEXT, stress INTEGER, legacy INTEGER, fingerprint TEXT, phonemes TEXT, "
+                            "PRIMARY KEY (lang, text, stress, legacy, fingerprint)) WITHOUT ROWID")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+    def get(self, key, default=None):
+        result = self.get_many([key])[0]
+        return default if result is None else result
+
+    def get_many(self, keys):
+        conn = self._connection()
+        results = []
+        for lang, text, stress, legacy, fingerprint in keys:
+            row = conn.execute("SELECT phonemes FROM segments WHERE lang = ? AND text = ? AND stress = ? "
+                               "AND legacy = ? AND fingerprint = ?",
+                               (lang, text, int(stress), int(legacy), fingerprint)).fetchone()
+            results.append(row[0] if row else None)
+        found = sum(result is not None for result in results)
+        self.hits += found
+        self.misses += len(results) - found
+        return results
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def put_many(self, items):
+        rows = [(lang, text, int(stress), int(legacy), fingerprint, value)
+                for (lang, text, stress, legacy, fingerprint), value in items]
+        if rows:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM segments")
+
+    def purge_stale(self):
+        """
+        Delete entries written by backend versions other than the ones installed now.
+
+        :return: The number of deleted entries
+        """
+        conn = self._connection()
+        langs = [row[0] for row in conn.execute("SELECT DISTINCT lang FROM segments")]
+        with conn:
+            conn.execute("BEGIN")
+            deleted = 0
+            for lang in langs:
+                deleted += conn.execute("DELETE FROM segments WHERE lang = ? AND fingerprint != ?",
+                                        (lang, backend_fingerprint(lang))).rowcount
+        return deleted
+
+    def export_jsonl(self, path):
+        """
+        Write every entry to a JSONL file, e.g. to start a new deployment with a warm cache.
+
+        :param path: Destination file
+        :return: The number of exported entries
+        """
+        count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            for lang, text, stress, legacy, fingerprint, phonemes in self._connection().execute(
+                    "SELECT lang, text, stress, legacy, fingerprint, phonemes FROM segments"):
+                f.write(json.dumps({"lang": lang, "text": text, "stress": bool(stress), "legacy": bool(legacy),
+                                    "fingerprint": fingerprint, "phonemes": phonemes}, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+    def import_jsonl(self, path, skip_stale=True):
+        """
+        Load entries written by :meth:`export_jsonl`.
+
+        :param path: Source file
+        :param skip_stale: Skip entries whose fingerprint does not match the installed backend versions
+        :return: The number of imported entries
+        """
+        items = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if skip_stale and row["fingerprint"] != backend_fingerprint(row["lang"]):
+                    continue
+                key = (row["lang"], row["text"], row["stress"], row["legacy"], row["fingerprint"])
+                items.append((key, row["phonemes"]))
+        self.put_many(items)
+        return len(items)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def stats(self):
+        """
+        :return: A dictionary with hits, misses, size and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class ContentHashIndex:
+    """
+    A SQLite index from the BLAKE2b digest of each cache key to its phonemes, for deduplicating large jobs across
+    shards and machines that share the file.
+
+    Keys take 16 bytes however long the segment is, so the index stays small, but unlike :class:`SqliteCache`
+    entries cannot be listed, exported or purged by backend version. Entries of other versions are never
+    returned because the backend fingerprint is part of the digest.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        """
+        :param path: Path to the database file, created if missing
+        :param timeout: Seconds to wait for another process holding a write lock
+        """
+        self.path = os.fspath(path)
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._connection()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = _connect(self.path, self.timeout,
+                            "CREATE TABLE IF NOT EXISTS digests (digest BLOB PRIMARY KEY, phonemes TEXT) WITHOUT ROWID")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def digest(key):
+        """
+        :param key: A cache key, (lang, text, stress, legacy, fingerprint)
+        :return: The 16 byte digest the key is stored under
+        """
+        lang, text, stress, legacy, fingerprint = key
+        data = "\x1f".join((lang, text, str(int(stress)), str(int(legacy)), fingerprint)).encode("utf-8")
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM digests").fetchone()[0]
+
+    def get(self, key, default=None):
+        result = self.get_many([key])[0]
+        return default if result is None else result
+
+    def get_many(self, keys):
+        conn = self._connection()
+        results = []
+        for key in keys:
+            row = conn.execute("SELECT phonemes FROM digests WHERE digest = ?", (self.digest(key),)).fetchone()
+            results.append(row[0] if row else None)
+        found = sum(result is not None for result in results)
+        self.hits += found
+        self.misses += len(results) - found
+        return results
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def put_many(self, items):
+        rows = [(self.digest(key), value) for key, value in items]
+        if rows:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("INSERT OR REPLACE INTO digests VALUES (?, ?)", rows)
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM digests")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def stats(self):
+        """
+        :return: A dictionary with hits, misses, size and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class TieredCache:
+    """
+    A fast cache in front of a slower, larger one, e.g. a SegmentCache in front of a SqliteCache.
+
+    Entries found in the back cache are copied into the front cache, new entries are written to both.
+    """
+
+    def __init__(self, front, back):
+        self.front = front
+        self.back = back
+
+    def get(self, key, default=None):
+        result = self.get_many([key])[0]
+        return default if result is None else result
+
+    def get_many(self, keys):
+        results = self.front.get_many(keys)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            found = self.back.get_many([keys[i] for i in missing])
+            promoted = []
+            for i, result in zip(missing, found):
+                if result is not None:
+                    results[i] = result
+                    promoted.append((keys[i], result))
+            self.front.put_many(promoted)
+        return results
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def put_many(self, items):
+        items = list(items)
+        self.front.put_many(items)
+        self.back.put_many(items)
+
+    def clear(self):
+        self.front.clear()
+        self.back.clear()
+
+    def stats(self):
+        """
+        :return: A dictionary with the stats of both caches and the overall hit_rate
+        """
+        front, back = self.front.stats(), self.back.stats()
+        lookups = front["hits"] + front["misses"]
+        hits = front["hits"] + back["hits"]
+        return {
+            "front": front,
+            "back": back,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
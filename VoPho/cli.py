@@ -0,0 +1,188 @@
+"""
+Phonemize text, TSV or JSONL corpora into JSONL.
+
+    vopho corpus.txt -o phonemes.jsonl --workers 8 --preload en ja
+    cat corpus.jsonl | vopho --format jsonl > phonemes.jsonl
+
+Every output line holds the input record with "phonemes" and "tokens" added. A "lang" field (JSONL) or second
+column (TSV) forces the language of that record.
+"""
+import argparse
+import json
+import os
+import sys
+import warnings
+from collections import deque
+from dataclasses import asdict
+from itertools import chain, islice
+from time import perf_counter
+
+from .corpus import apply_language_hint, iter_records
+
+
+class Progress:
+    """
+    Prints the record count and throughput to stderr at most once per ``interval`` seconds.
+    """
+
+    def __init__(self, interval=1.0, enabled=True, initial=0):
+        self.interval = interval
+        self.enabled = enabled
+        self.count = initial
+        self.initial = initial
+        self.start = perf_counter()
+        self.last = self.start
+
+    def update(self, count=1):
+        self.count += count
+        now = perf_counter()
+        if self.enabled and now - self.last >= self.interval:
+            self.last = now
+            self._print(now, end="\r")
+
+    def finish(self):
+        if self.enabled:
+            self._print(perf_counter(), end="\n")
+
+    def _print(self, now, end):
+        elapsed = now - self.start
+        rate = (self.count - self.initial) / elapsed if elapsed else 0.0
+        print(f"{self.count} records, {rate:.1f} records/s", end=end, file=sys.stderr, flush=True)
+
+
+def count_complete_lines(path):
+    """
+    Count the complete lines of a partial output file, dropping a trailing partial line if the last run was killed.
+
+    :param path: Path to the output file
+    :return: The number of complete lines
+    """
+    if not os.path.exists(path):
+        return 0
+    count = 0
+    complete_size = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            count += 1
+            complete_size += len(line)
+    if complete_size != os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(complete_size)
+    return count
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="vopho", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", default=["-"], help="Input files, '-' or nothing reads stdin")
+    parser.add_argument("-o", "--output", default="-", help="Output JSONL file, '-' writes stdout")
+    parser.add_argument("--format", choices=("text", "tsv", "jsonl"),
+                        help="Input format, guessed from the file extension by default (stdin defaults to text)")
+    parser.add_argument("--field", default="text", help="JSONL key holding the text")
+    parser.add_argument("--lang-field", default="lang", help="JSONL key holding an optional language hint")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each with its own loaded backends")
+    parser.add_argument("--prefork", action="store_true",
+                        help="Load the backends once and fork the workers so they share the models (not on Windows)")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="torch/BLAS threads per worker process")
+    parser.add_argument("--batch-size", type=int, default=64, help="Records phonemized together")
+    parser.add_argument("--preload", nargs="*", default=["en"], metavar="LANG",
+                        help="Languages to load before the first record")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip the records already written to --output and append the rest")
+    parser.add_argument("--no-tokens", action="store_true", help="Only write phonemes, not tokens")
+    parser.add_argument("--stress", action="store_true", help="Keep stress marks where the backend supports them")
+    parser.add_argument("--legacy", action="store_true", help="Use the legacy English phonemizer")
+    parser.add_argument("--cache-size", type=int, default=0, help="In-memory segment cache entries per process")
+    parser.add_argument("--cache-path", help="SQLite segment cache shared by all workers")
+    parser.add_argument("--dedup-index", help="Content-hash index of phonemized segments shared by all shards of a job")
+    parser.add_argument("--detect-languages", nargs="+", metavar="LANG",
+                        help="Languages the detector chooses between for Latin text, 'all' for every language")
+    parser.add_argument("--low-accuracy-detection", action="store_true",
+                        help="Faster, smaller language detection that is less accurate on short words")
+    parser.add_argument("--preload-detection-models", action="store_true",
+                        help="Load all language detection models before the first record")
+    parser.add_argument("--detection-snapshot",
+                        help="Word language detections saved with Tokenizer.save_detection_cache, loaded by every worker")
+    parser.add_argument("--quiet", action="store_true", help="Do not print progress")
+    return parser
+
+
+def read_records(args):
+    sources = [sys.stdin if path == "-" else path for path in args.inputs]
+    return chain.from_iterable(iter_records(source, fmt=args.format, field=args.field, lang_field=args.lang_field)
+                               for source in sources)
+
+
+def phonemize_records(records, args):
+    """
+    Phonemize (record, text, lang) tuples from :func:`read_records` lazily, yielding (record, result) pairs in
+    input order.
+    """
+    phonemizer_kwargs = {
+        "stress": args.stress,
+        "legacy": args.legacy,
+        "cache_size": args.cache_size,
+        "cache_path": args.cache_path,
+        "dedup_index": args.dedup_index,
+        "detection_languages": "all" if args.detect_languages == ["all"] else args.detect_languages,
+        "low_accuracy_detection": args.low_accuracy_detection,
+        "preload_detection_models": args.preload_detection_models,
+        "detection_snapshot": args.detection_snapshot,
+    }
+    pending = deque()
+
+    def texts():
+        for record, text, lang in records:
+            pending.append(record)
+            yield apply_language_hint(text, lang)
+
+    if args.workers > 1:
+        from .runner import PhonemizerPool, PreforkPhonemizerPool
+        pool_class = PreforkPhonemizerPool if args.prefork else PhonemizerPool
+        pool = pool_class(processes=args.workers, languages=args.preload,
+                          threads_per_worker=args.threads_per_worker, **phonemizer_kwargs)
+        with pool:
+            for result in pool.imap(texts(), output_tokens=True, batch_size=args.batch_size):
+                yield pending.popleft(), result
+    else:
+        from .engine import Phonemizer
+        engine = Phonemizer(preload=args.preload, **phonemizer_kwargs)
+        for result in engine.phonemize_stream(texts(), chunk_size=args.batch_size, output_tokens=True):
+            yield pending.popleft(), result
+        if not args.quiet:
+            stats = engine.dedup_stats()
+            print(f"{stats['duplicates']} of {stats['segments']} segments deduplicated ({stats['ratio']:.1%})",
+                  file=sys.stderr)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    warnings.simplefilter("ignore")
+
+    done = 0
+    if args.resume:
+        if args.output == "-":
+            raise SystemExit("--resume needs an --output file")
+        done = count_complete_lines(args.output)
+
+    records = islice(read_records(args), done, None)
+    progress = Progress(enabled=not args.quiet, initial=done)
+
+    out = sys.stdout if args.output == "-" else open(args.output, 'a' if args.resume else 'w', encoding='utf-8')
+    try:
+        for record, (phonemes, tokens) in phonemize_records(records, args):
+            record["phonemes"] = phonemes
+            if not args.no_tokens:
+                record["tokens"] = [asdict(token) for token in tokens]
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            progress.update()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        progress.finish()
+
+
+if __name__ == "__main__":
+    main()
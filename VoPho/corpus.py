@@ -0,0 +1,108 @@
+import json
+import os
+from itertools import islice
+
+# File extensions that are read as one JSON object per line, or as tab separated columns
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+TSV_EXTENSIONS = ('.tsv',)
+
+# Language hints that differ from the IDs the engine uses
+LANGUAGE_HINT_ALIASES = {
+    'ru': 'cy',
+}
+
+
+def chunked(iterable, size):
+    """
+    Lazily split an iterable into lists of at most ``size`` items.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def guess_format(path):
+    """
+    Guess the format of a corpus file from its extension.
+
+    :param path: Path to the corpus file
+    :return: "jsonl", "tsv" or "text"
+    """
+    path = str(path).lower()
+    if path.endswith(JSONL_EXTENSIONS):
+        return "jsonl"
+    if path.endswith(TSV_EXTENSIONS):
+        return "tsv"
+    return "text"
+
+
+def _iter_lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from f
+
+
+def iter_records(source, fmt=None, field="text", lang_field="lang"):
+    """
+    Lazily read the records of a corpus.
+
+    :param source: A path to a corpus file, or an iterable of strings (e.g. an open file) or dictionaries
+    :param fmt: "text" (one text per line), "tsv" (text, then an optional language column) or "jsonl"
+                (one JSON object per line), guessed from the extension if None
+    :param field: The key holding the text in JSON objects and dictionaries
+    :param lang_field: The key holding an optional language hint in JSON objects and dictionaries
+    :return: A generator of (record, text, lang) tuples: the JSON object or dictionary as it was read (for text and
+             TSV lines, a dictionary with "text" and, if given, "lang"), its text, and its language hint or None
+    """
+    if isinstance(source, (str, os.PathLike)):
+        fmt = fmt or guess_format(source)
+        lines = _iter_lines(source)
+    else:
+        fmt = fmt or "text"
+        lines = source
+
+    for line in lines:
+        if isinstance(line, dict) or fmt == "jsonl":
+            if isinstance(line, dict):
+                record = dict(line)
+            else:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+            yield record, record[field], record.get(lang_field)
+            continue
+
+        line = line.rstrip('\r\n')
+        if fmt == "tsv":
+            columns = line.split('\t')
+            lang = columns[1] if len(columns) > 1 and columns[1] else None
+            record = {"text": columns[0]} if lang is None else {"text": columns[0], "lang": lang}
+            yield record, columns[0], lang
+        else:
+            yield {"text": line}, line, None
+
+
+def iter_texts(source, fmt=None, field="text"):
+    """
+    Lazily read the texts of a corpus, see :func:`iter_records`.
+
+    :return: A generator of texts
+    """
+    for _, text, _ in iter_records(source, fmt=fmt, field=field):
+        yield text
+
+
+def apply_language_hint(text, lang):
+    """
+    Force the language of a text by wrapping it in a language tag.
+
+    :param text: The text
+    :param lang: A language ID ('en', 'ja', 'zh', 'cy', 'th', 'phoneme', ...), "ru" is accepted for 'cy'; None leaves text as is
+    :return: The tagged text
+    """
+    if not lang:
+        return text
+    lang = LANGUAGE_HINT_ALIASES.get(lang, lang)
+    return f"<{lang}>{text}</{lang}>"
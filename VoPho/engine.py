@@ -1,22 +1,105 @@
+import asyncio
+import os
+import threading
 import warnings
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, perf_counter, time
 from termcolor import colored
-from .phonemizers import english, japanese, mandarin, russian, thai
+from .phonemizers import create_phonemizer, get_registration, has_phonemizer, registered_languages
 from .langtokenizers.multicoded import Tokenizer, LANGUAGE_COLORS
-from VoPho.langtokenizers.tokens import Token
+from VoPho.langtokenizers.tokens import Token, TokenBatch
+from .cache import ContentHashIndex, SegmentCache, SqliteCache, TieredCache, backend_fingerprint
+from .corpus import chunked, iter_texts
+from .metrics import NULL_METRICS
+from .memory import release_memory, resident_bytes
 import re
 
+# Weight of the newest call in the running per-character cost of each backend path
+COST_SMOOTHING = 0.2
+
+# Seconds after which a path skipped for being too slow is measured again in the background, so one outlier cannot
+# rule it out for good
+COST_RETRY_SECONDS = 30.0
+
+
+# Longest pause between two background sweeps for idle backends
+IDLE_SWEEP_SECONDS = 60.0
+
+# Per-thread backend instances kept per language for other threads once their thread has ended
+MAX_SPARE_BACKENDS = 4
+
+
+def _backend_key(lang, path):
+    return lang if path == "default" else f"{lang}:{path}"
+
+
+class _ThreadBackends:
+    """
+    The per-thread backend instances of one thread, which go back to the engine when the thread ends.
+    """
+
+    def __init__(self, engine):
+        self.entries = {}
+        weakref.finalize(self, _return_thread_backends, weakref.ref(engine), self.entries)
+
+
+def _sweep_idle(engine_ref, interval, stop):
+    # Holds the engine weakly, so the sweep ends once the engine is collected
+    while not stop.wait(interval):
+        engine = engine_ref()
+        if engine is None:
+            return
+        engine.evict_idle()
+        del engine
+
+
+def _return_thread_backends(engine_ref, entries):
+    engine = engine_ref()
+    if engine is not None:
+        for key, entry in list(entries.items()):
+            engine._return_spare(key, entry)
+
 
 class Phonemizer:
     """
     A class for phonemizing text in multiple languages,
     """
 
-    def __init__(self, working_path=None, stress=False, legacy=False, manual_fixes=None):
+    def __init__(self, working_path=None, stress=False, legacy=False, manual_fixes=None, executor_workers=1,
+                 cache_size=0, cache_path=None, cache=None, preload=None, metrics=None,
+                 idle_timeout=None, memory_budget=None, dedup=True, dedup_index=None, thread_safe=False,
+                 detection_languages=None, low_accuracy_detection=False, preload_detection_models=False,
+                 detection_cache_size=65536, detection_snapshot=None):
         """
         Initialize the Phonemizer.
 
         :param working_path: Optional path for working directory
         :param stress: Optional toggle for stress, for phonemisers that support it
+        :param executor_workers: Threads per language executor used by the async API
+        :param cache_size: Number of phonemized segments to keep in an in-memory LRU cache, 0 disables it
+        :param cache_path: Optional path to a SQLite cache shared between processes and kept across restarts,
+                           combined with the in-memory cache when both are set
+        :param cache: Optional cache object with get_many/put_many methods, used instead of the caches above
+        :param dedup: Phonemize identical segments of a batch once and copy the result to every occurrence
+        :param dedup_index: Optional path to a ``ContentHashIndex`` shared between shards of a large job, consulted
+                            after the caches above
+        :param preload: Optional list of language IDs to load with :meth:`warmup` before returning
+        :param metrics: Optional ``VoPho.metrics.MetricsSink`` receiving counters and latencies, nothing is measured if None
+        :param idle_timeout: Optional number of seconds after which an unused backend is unloaded, checked on every
+                             backend lookup and by a background thread, so idle workers shrink too
+        :param memory_budget: Optional number of bytes the loaded backends may take up, least recently used backends
+                              are unloaded to stay under it. Sizes are approximate, see :meth:`backend_info`
+        :param thread_safe: Give every thread its own instance of backends that are not registered as reentrant,
+                            so one Phonemizer can be shared by the threads of a server, see :meth:`get_phonemizer`
+        :param detection_languages: ISO 639-1 codes the language detector chooses between for Latin and Devanagari
+                                    text, or "all", defaults to the languages with a backend
+        :param low_accuracy_detection: Use lingua's faster, smaller low accuracy mode
+        :param preload_detection_models: Build the language detector with all its models loaded now, instead of
+                                         loading it and then each model on first use
+        :param detection_cache_size: Number of words whose detected language is remembered, 0 disables it
+        :param detection_snapshot: Path of a snapshot written by ``Tokenizer.save_detection_cache``, loaded into
+                                   the detection cache if it exists
         """
         if manual_fixes is None:
             self.manual_fixes = {}
@@ -25,8 +108,52 @@ class Phonemizer:
         self.working_path = working_path
         self.stress = stress
         self._phonemizers = {}
-        self.Tokenizer = Tokenizer()
+        self._backend_info = {}
+        self._backend_locks = {}
+        self._generations = {}
+        # Per-thread instances of threads that have finished, handed to the next thread that needs one
+        self._spare_phonemizers = {}
+        self._instances_lock = threading.Lock()
+        self._local = threading.local()
+        self.thread_safe = thread_safe
+        self._costs = {}
+        self._cost_times = {}
+        self._probing = set()
+        self.idle_timeout = idle_timeout
+        self.memory_budget = memory_budget
+        self._sweep_stop = threading.Event()
+        if idle_timeout is not None:
+            interval = min(idle_timeout / 2, IDLE_SWEEP_SECONDS)
+            threading.Thread(target=_sweep_idle, args=(weakref.ref(self), interval, self._sweep_stop),
+                             name="vopho-idle-sweep", daemon=True).start()
+            weakref.finalize(self, self._sweep_stop.set)
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.Tokenizer = Tokenizer(metrics=self.metrics, languages=detection_languages,
+                                   low_accuracy=low_accuracy_detection, preload=preload_detection_models,
+                                   cache_size=detection_cache_size)
+        if detection_snapshot is not None and os.path.exists(detection_snapshot):
+            self.Tokenizer.load_detection_cache(detection_snapshot)
         self.legacy = legacy
+        self.executor_workers = executor_workers
+        self._executors = {}
+        if cache is None:
+            tiers = []
+            if cache_size:
+                tiers.append(SegmentCache(cache_size))
+            if cache_path:
+                tiers.append(SqliteCache(cache_path))
+            if dedup_index:
+                tiers.append(ContentHashIndex(dedup_index))
+            for tier in reversed(tiers):
+                cache = tier if cache is None else TieredCache(tier, cache)
+        self.cache = cache
+        self.dedup = dedup
+        self._dedup_segments = 0
+        self._dedup_unique = 0
+        self.load_times = {}
+
+        if preload:
+            self.warmup(preload)
 
     def pretty_print(self, tokens: list[Token]):
         """
@@ -57,61 +184,286 @@ class Phonemizer:
             print(colored(colored_text, color), end='')
         print("")
 
-    def get_phonemizer(self, lang):
+    def get_phonemizer(self, lang, path="default"):
         """
         Get or create a phonemizer for the specified language.
 
-        :param lang: Language code (e.g., 'en', 'ja', 'zh', 'ru')
+        Backends come from the registry in ``VoPho.phonemizers``, their modules are imported on first use.
+        Threads asking for a backend that is being built wait for it instead of building their own, and in
+        ``thread_safe`` mode every thread gets its own instance of backends not registered as reentrant.
+
+        :param lang: Language code (e.g., 'en', 'ja', 'zh', 'cy')
+        :param path: "default", or one of the language's registered fallbacks (e.g. 'fast' or 'legacy' for 'en'),
+                     which are tracked as "lang:path" in :meth:`backend_info`
         :return: A phonemizer instance for the specified language, or None if not supported
         """
-        if lang not in self._phonemizers:
-            if lang == 'en':
-                self._phonemizers[lang] = english.Phonemizer(stress=self.stress, legacy=self.legacy)
-            elif lang == 'ja':
-                self._phonemizers[lang] = japanese.Phonemizer()
-            elif lang == 'zh':
-                self._phonemizers[lang] = mandarin.Phonemizer()
-            elif lang == 'cy': # cyrillic treated as russian
-                self._phonemizers[lang] = russian.Phonemizer(working_path=self.working_path, stress=self.stress)
-            elif lang == 'th':
-                self._phonemizers[lang] = thai.Phonemizer()
-        return self._phonemizers.get(lang)
+        registration = get_registration(lang)
+        if registration is None:
+            return None
+
+        key = _backend_key(lang, path)
+        if self.thread_safe and not registration["reentrant"]:
+            backend = self._thread_local_phonemizer(lang, path, key)
+        else:
+            backend = self._phonemizers.get(key)
+            if backend is None:
+                with self._backend_locks.setdefault(key, threading.Lock()):
+                    backend = self._phonemizers.get(key)
+                    if backend is None:
+                        backend = self._phonemizers[key] = self._load_backend(lang, path, key)
+
+        info = self._backend_info.get(key)
+        if info is not None:
+            info["last_used"] = monotonic()
+        if self.idle_timeout is not None:
+            self.evict_idle()
+        return backend
+
+    def _thread_local_phonemizer(self, lang, path, key):
+        # Instances made before the language was last unloaded are rebuilt
+        holder = getattr(self._local, "phonemizers", None)
+        if holder is None:
+            holder = self._local.phonemizers = _ThreadBackends(self)
+        backends = holder.entries
+        generation = self._generations.get(key, 0)
+        entry = backends.get(key)
+        if entry is None or entry[0] != generation:
+            if entry is not None:
+                self._drop_instance(key, entry)
+            entry = self._take_spare(key, generation) or (generation, self._load_backend(lang, path, key))
+            backends[key] = entry
+        return entry[1]
+
+    def _take_spare(self, key, generation):
+        spares = self._spare_phonemizers.get(key)
+        while spares:
+            try:
+                entry = spares.pop()
+            except IndexError:
+                break
+            if entry[0] == generation:
+                return entry
+        return None
+
+    def _return_spare(self, key, entry):
+        # Keeps an instance for other threads, unless it predates an unload or enough are kept already
+        spares = self._spare_phonemizers.setdefault(key, [])
+        if entry[0] == self._generations.get(key, 0) and len(spares) < MAX_SPARE_BACKENDS:
+            spares.append(entry)
+        else:
+            self._drop_instance(key, entry)
+
+    def _drop_instance(self, key, entry):
+        info = self._backend_info.get(key)
+        if info is not None and entry[0] == self._generations.get(key, 0):
+            with self._instances_lock:
+                info["instances"] -= 1
+
+    def _release_thread_local(self, key):
+        # Hands this thread's instance over to other threads, e.g. when a warmup thread is done with it
+        holder = getattr(self._local, "phonemizers", None)
+        entry = holder.entries.pop(key, None) if holder is not None else None
+        if entry is not None:
+            self._return_spare(key, entry)
+
+    def _loaded_backends(self):
+        """
+        :return: (key, backend) pairs of the shared instances, the calling thread's own instances and the spare ones
+        """
+        backends = list(self._phonemizers.items())
+        holder = getattr(self._local, "phonemizers", None)
+        if holder is not None:
+            backends.extend((key, backend) for key, (_, backend) in holder.entries.items())
+        for key, spares in list(self._spare_phonemizers.items()):
+            backends.extend((key, backend) for _, backend in spares)
+        return backends
+
+    def _load_backend(self, lang, path, key):
+        rss = resident_bytes()
+        start = perf_counter()
+        backend = create_phonemizer(lang, self, path)
+        load_seconds = perf_counter() - start
+        with self._instances_lock:
+            info = self._backend_info.setdefault(key, {"loaded_at": monotonic(), "last_used": monotonic(),
+                                                       "load_seconds": load_seconds, "rss_before": rss,
+                                                       "size_bytes": None, "calls": 0, "instances": 0})
+            info["instances"] += 1
+        if self.metrics.enabled:
+            self.metrics.observe("backend.load.seconds", load_seconds, lang=key)
+        return backend
+
+    def backend_info(self):
+        """
+        Report on the loaded backends.
+
+        ``size_bytes`` is the growth of the resident set size from constructing a backend to the end of its first
+        call, which is when most backends load their models. It is None until then, and only approximate when
+        backends load concurrently. ``instances`` counts the live copies, more than one for backends held per
+        thread in ``thread_safe`` mode, each taking about ``size_bytes``.
+
+        :return: A dictionary mapping each loaded language to its "size_bytes", "instances", "load_seconds",
+                 "calls", "last_used" (a Unix timestamp) and "idle_seconds"
+        """
+        now = monotonic()
+        wall = time()
+        return {lang: {"size_bytes": info["size_bytes"], "instances": info["instances"],
+                       "load_seconds": info["load_seconds"], "calls": info["calls"],
+                       "last_used": wall - (now - info["last_used"]), "idle_seconds": now - info["last_used"]}
+                for lang, info in list(self._backend_info.items())}
+
+    def unload(self, lang, reason="manual"):
+        """
+        Drop a loaded backend, it is rebuilt the next time the language is needed.
+
+        :param lang: Language code, or "lang:path" for a fallback backend
+        :return: True if a backend was unloaded
+        """
+        backend = self._phonemizers.pop(lang, None)
+        self._spare_phonemizers.pop(lang, None)
+        info = self._backend_info.pop(lang, None)
+        if info is None:
+            return False
+        # Thread-local instances are dropped by their threads on next use
+        self._generations[lang] = self._generations.get(lang, 0) + 1
+        del backend
+        release_memory()
+        if self.metrics.enabled:
+            self.metrics.increment("backend.unloads", lang=lang, reason=reason)
+        return True
+
+    def evict_idle(self):
+        """
+        Unload every backend that has not been used for ``idle_timeout`` seconds.
+
+        :return: The languages that were unloaded
+        """
+        if self.idle_timeout is None:
+            return []
+        cutoff = monotonic() - self.idle_timeout
+        idle = [lang for lang, info in list(self._backend_info.items()) if info["last_used"] < cutoff]
+        return [lang for lang in idle if self.unload(lang, reason="idle")]
+
+    def _enforce_memory_budget(self, keep):
+        # Unload least recently used backends, never the one that was just used, until the known sizes fit
+        while True:
+            infos = list(self._backend_info.items())
+            total = sum((info["size_bytes"] or 0) * info["instances"] for _, info in infos)
+            candidates = [(info["last_used"], lang) for lang, info in infos if lang != keep]
+            if total <= self.memory_budget or not candidates:
+                return
+            self.unload(min(candidates)[1], reason="memory")
+
+    def _record_call(self, lang):
+        info = self._backend_info.get(lang)
+        if info is None:
+            return
+        info["calls"] += 1
+        info["last_used"] = monotonic()
+        if info["size_bytes"] is None:
+            rss = resident_bytes()
+            if rss is not None and info["rss_before"] is not None:
+                info["size_bytes"] = max(rss - info["rss_before"], 0)
+            if self.memory_budget is not None:
+                self._enforce_memory_budget(keep=lang)
+
+    def loaded_languages(self):
+        """
+        :return: The IDs of the languages whose backends have been constructed
+        """
+        return list(self._backend_info)
+
+    def warmup(self, languages=None, detector=True, fallbacks=False):
+        """
+        Load language backends and the language detector concurrently, then phonemize one sample per language.
+
+        :param languages: Language IDs to load, defaults to every registered language
+        :param detector: Also load the language detector used for Latin and Devanagari text
+        :param fallbacks: Also load the languages' fallback backends, so ``deadline_ms`` calls can pick them from
+                          the start (they are named "lang:path" in the result)
+        :return: A dictionary mapping each language (and "detector") to the seconds it took, also kept in ``load_times``
+        """
+        languages = registered_languages() if languages is None else languages
+        for lang in languages:
+            if not has_phonemizer(lang):
+                raise ValueError(f"No phonemizer is registered for language '{lang}'")
+
+        jobs = {lang: (self._warmup_language, lang) for lang in languages}
+        if fallbacks:
+            for lang in languages:
+                for path in get_registration(lang)["fallbacks"]:
+                    jobs[_backend_key(lang, path)] = (self._warmup_language, lang, path)
+        if detector:
+            jobs["detector"] = (self.Tokenizer.load_detector,)
+
+        def timed(function, *arguments):
+            start = perf_counter()
+            function(*arguments)
+            return perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=max(len(jobs), 1), thread_name_prefix="vopho-warmup") as executor:
+            futures = {name: executor.submit(timed, *job) for name, job in jobs.items()}
+            times = {name: future.result() for name, future in futures.items()}
+
+        self.load_times.update(times)
+        return times
+
+    def _warmup_language(self, lang, path="default"):
+        # Bypass the cache so the backend itself runs once
+        registration = get_registration(lang)
+        self._run_backend([registration["sample"]], lang, path)
+        if self.thread_safe and not registration["reentrant"]:
+            # The warmup thread is about to end, its instance goes to the first thread that needs one
+            self._release_thread_local(_backend_key(lang, path))
 
     def seperate_languages(self, text):
         """
-        Separate the input text into segments based on language tags.
+        Separate the input text into segments based on language.
 
-        :param text: Input text with language tags
+        Punctuation and whitespace stay with the segment before them.
+
+        :param text: Input text, optionally with language tags
         :return: A list of dictionaries containing text segments and their languages
         """
-        text = self.Tokenizer.tokenize(text)
+        start = perf_counter()
+        result = self._segments_from_spans(text, self.Tokenizer.spans(text))
+        if self.metrics.enabled:
+            self.metrics.observe("tokenize.seconds", perf_counter() - start)
+        return result
 
-        pattern = r'(<(\w+)>(.*?)</\2>)|([^<]+)'
-        matches = re.findall(pattern, text)
+    def seperate_languages_batch(self, texts):
+        """
+        Separate many input texts at once, see :meth:`seperate_languages`. Language detection for the words of
+        every text runs in one parallel call.
 
+        :param texts: A list of input texts
+        :return: A list with the segments of each text
+        """
+        start = perf_counter()
+        results = [self._segments_from_spans(text, spans)
+                   for text, spans in zip(texts, self.Tokenizer.spans_batch(texts))]
+        if self.metrics.enabled:
+            self.metrics.observe("tokenize.seconds", perf_counter() - start)
+        return results
+
+    @staticmethod
+    def _segments_from_spans(text, spans):
         result = []
-        current_item = {"text": "", "lang": None}
-
-        for match in matches:
-            if match[1]:  # Tagged content
-                lang, content = match[1], match[2]
-                if current_item["lang"] != lang:
-                    if current_item["text"]:
-                        result.append(current_item)
-                    current_item = {"text": content, "lang": lang}
-                else:
-                    current_item["text"] += content
-            else:  # Untagged content (punctuation or spaces)
-                untagged_content = match[3]
-                if current_item["text"]:
-                    current_item["text"] += untagged_content
-                else:
-                    result.append({"text": untagged_content, "lang": "untagged"})
-
-        if current_item["text"]:
-            result.append(current_item)
+        for span in spans:
+            content = text[span.start:span.end]
+            if span.lang is None:  # Punctuation or spaces
+                if result:
+                    result[-1]["text"] += content
+                elif content.strip():
+                    result.append({"text": content, "lang": "untagged"})
+            elif result and result[-1]["lang"] == span.lang:
+                result[-1]["text"] += content
+            else:
+                result.append({"text": content, "lang": span.lang})
 
-        return result
+        if result:
+            result[0]["text"] = result[0]["text"].lstrip()
+            result[-1]["text"] = result[-1]["text"].rstrip()
+        return [item for item in result if item["text"]]
 
     def phonemize_for_language(self, text, lang):
         """
@@ -121,55 +473,461 @@ class Phonemizer:
         :param lang: The language ID for phonemization
         :return: Phonemized text, or original text wrapped in <??> tags if language is not supported
         """
-        if lang != "phoneme":
-            phonemizer = self.get_phonemizer(lang)
-            if phonemizer:
-                return phonemizer.phonemize(text)
-            return f"<??>{text}</??>"  # Return original text if no phonemizer available
-        else:
-            return text
+        return self._phonemize_segments([text], lang)[0]
+
+    def _phonemize_segments(self, texts, lang, path="default"):
+        """
+        Phonemize several segments of the same language with a single backend lookup.
+
+        Backends that expose a ``phonemize_batch(texts)`` method receive every segment in one call,
+        other backends are called once per segment.
+
+        Repeated segments are looked up and phonemized once when ``dedup`` is on.
+
+        :param texts: A list of plaintext segments, all in the same language
+        :param lang: The language ID for phonemization
+        :param path: The backend path, see :meth:`get_phonemizer`
+        :return: A list of phonemized segments in the same order as ``texts``
+        """
+        if lang == "phoneme":
+            return list(texts)
+
+        if self.metrics.enabled:
+            self.metrics.increment("segments", len(texts), lang=lang)
+            for text in texts:
+                self.metrics.observe("segment.chars", len(text), lang=lang)
+
+        if self.dedup and len(texts) > 1:
+            unique = list(dict.fromkeys(texts))
+            self._dedup_segments += len(texts)
+            self._dedup_unique += len(unique)
+            if len(unique) < len(texts):
+                if self.metrics.enabled:
+                    self.metrics.increment("segments.deduplicated", len(texts) - len(unique), lang=lang)
+                phonemized = dict(zip(unique, self._phonemize_unique(unique, lang, path)))
+                return [phonemized[text] for text in texts]
+        return self._phonemize_unique(texts, lang, path)
+
+    def _cache_keys(self, texts, lang, path):
+        fingerprint = backend_fingerprint(lang)
+        if path != "default":
+            fingerprint += f";path={path}"
+        return [(lang, text, self.stress, self.legacy, fingerprint) for text in texts]
+
+    def _phonemize_unique(self, texts, lang, path="default"):
+        if self.cache is None or not has_phonemizer(lang):
+            return self._run_backend(texts, lang, path)
+
+        # Only segments missing from the cache reach the backend
+        keys = self._cache_keys(texts, lang, path)
+        results = self.cache.get_many(keys)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if self.metrics.enabled:
+            self.metrics.increment("cache.hits", len(texts) - len(missing), lang=lang)
+            self.metrics.increment("cache.misses", len(missing), lang=lang)
+        if missing:
+            for i, result in zip(missing, self._run_backend([texts[i] for i in missing], lang, path)):
+                results[i] = result
+            self.cache.put_many([(keys[i], results[i]) for i in missing])
+        return results
+
+    def dedup_stats(self):
+        """
+        :return: A dictionary with the segments seen in batches, how many were unique, the duplicates that were
+                 not phonemized again and the dedup ratio (duplicates / segments)
+        """
+        duplicates = self._dedup_segments - self._dedup_unique
+        return {
+            "segments": self._dedup_segments,
+            "unique": self._dedup_unique,
+            "duplicates": duplicates,
+            "ratio": duplicates / self._dedup_segments if self._dedup_segments else 0.0,
+        }
+
+    def _run_backend(self, texts, lang, path="default"):
+        phonemizer = self.get_phonemizer(lang, path)
+        if not phonemizer:
+            if self.metrics.enabled:
+                self.metrics.increment("unsupported", len(texts), lang=lang)
+            return [f"<??>{text}</??>" for text in texts]  # Return original text if no phonemizer available
+
+        key = _backend_key(lang, path)
+        start = perf_counter()
+        results = self._call_backend(phonemizer, texts, key)
+        self._record_cost(key, perf_counter() - start, sum(len(text) for text in texts))
+        self._record_call(key)
+        return results
+
+    def _record_cost(self, key, seconds, chars):
+        if chars:
+            cost = seconds / chars
+            previous = self._costs.get(key)
+            self._costs[key] = cost if previous is None else previous + COST_SMOOTHING * (cost - previous)
+            self._cost_times[key] = monotonic()
+
+    def estimate_cost(self, lang, chars, path="default"):
+        """
+        Estimate how long a backend path takes for a segment, from the running average of its recent calls.
+
+        :param lang: Language code
+        :param chars: Length of the segment
+        :param path: The backend path, see :meth:`get_phonemizer`
+        :return: Seconds, or None if the path has not run yet
+        """
+        cost = self._costs.get(_backend_key(lang, path))
+        return None if cost is None else cost * chars
+
+    def _choose_path(self, lang, text, budget):
+        # The most expensive path measured to fit the budget, the cheapest path is the last resort. Paths never
+        # measured, or skipped with an estimate COST_RETRY_SECONDS old, are measured in the background instead of
+        # by this call, which has a deadline to meet
+        paths = ["default"] + list(get_registration(lang)["fallbacks"])
+        now = monotonic()
+        for path in paths:
+            cost = self.estimate_cost(lang, len(text), path)
+            if cost is not None and cost <= budget:
+                return path
+            key = _backend_key(lang, path)
+            if cost is None or now - self._cost_times.get(key, now) >= COST_RETRY_SECONDS:
+                self._schedule_probe(lang, path, key, text)
+        return paths[-1]
+
+    def _schedule_probe(self, lang, path, key, text):
+        # Backends shared by every thread cannot be called from a probe thread unless they are reentrant, so
+        # loaded ones are left to refresh their estimate from calls without a deadline
+        shared = not self.thread_safe and not get_registration(lang)["reentrant"]
+        if key in self._probing or (shared and key in self._phonemizers):
+            return
+        self._probing.add(key)
+        threading.Thread(target=self._probe, args=(lang, path, key, text, shared), name=f"vopho-probe-{key}",
+                         daemon=True).start()
+
+    def _probe(self, lang, path, key, text, shared):
+        """
+        Measure a backend path on one segment outside any deadline-bound call.
+        """
+        try:
+            # A shared backend is measured before it is published, so no request can be using it at the same time
+            backend = self._load_backend(lang, path, key) if shared else self.get_phonemizer(lang, path)
+            start = perf_counter()
+            self._call_backend(backend, [text], key)
+            # A fresh measurement replaces the running average, which may be held up by an outlier
+            self._costs[key] = (perf_counter() - start) / len(text)
+            self._cost_times[key] = monotonic()
+            if shared:
+                with self._backend_locks.setdefault(key, threading.Lock()):
+                    if key in self._phonemizers:
+                        self._drop_instance(key, (self._generations.get(key, 0), backend))
+                    else:
+                        self._phonemizers[key] = backend
+        except Exception as error:
+            warnings.warn(f"Could not measure the '{key}' backend: {error}")
+        finally:
+            self._probing.discard(key)
+
+    def _phonemize_with_deadline(self, separated, deadline):
+        """
+        Phonemize segments one by one, each with the best backend path expected to finish within its share of the
+        time left. Segments already cached for the default path are always used as they are.
+
+        :return: The phonemized segments, and the path that produced each
+        """
+        phonemized = []
+        paths = []
+        chars_left = sum(len(item["text"]) for item in separated)
+        for item in separated:
+            text, lang = item["text"], item["lang"]
+            share = len(text) / chars_left if chars_left else 1.0
+            chars_left -= len(text)
+
+            if lang == "phoneme" or not has_phonemizer(lang):
+                phonemized.append(self._phonemize_segments([text], lang)[0])
+                paths.append("phoneme" if lang == "phoneme" else "unsupported")
+                continue
+            if self.cache is not None:
+                cached = self.cache.get_many(self._cache_keys([text], lang, "default"))[0]
+                if cached is not None:
+                    phonemized.append(cached)
+                    paths.append("cache")
+                    continue
+
+            path = self._choose_path(lang, text, (deadline - perf_counter()) * share)
+            if path != "default" and self.metrics.enabled:
+                self.metrics.increment("deadline.fallbacks", lang=lang, path=path)
+            phonemized.append(self._phonemize_segments([text], lang, path)[0])
+            paths.append(path)
+        return phonemized, paths
+
+    def _call_backend(self, phonemizer, texts, lang):
+        phonemize_batch = getattr(phonemizer, "phonemize_batch", None)
+        if not self.metrics.enabled:
+            if phonemize_batch is not None:
+                return list(phonemize_batch(texts))
+            return [phonemizer.phonemize(text) for text in texts]
+
+        if phonemize_batch is not None:
+            start = perf_counter()
+            results = list(phonemize_batch(texts))
+            self.metrics.observe("backend.seconds", perf_counter() - start, lang=lang)
+            return results
+
+        results = []
+        for text in texts:
+            start = perf_counter()
+            results.append(phonemizer.phonemize(text))
+            self.metrics.observe("backend.seconds", perf_counter() - start, lang=lang)
+        return results
+
+    @staticmethod
+    def _build_output(separated, phonemized, output_tokens):
+        """
+        Join phonemized segments back into the output format of :meth:`phonemize`.
 
-    def phonemize(self, input_text, output_tokens=False):
+        :param separated: The segments returned by :meth:`seperate_languages`
+        :param phonemized: The phonemized text for each segment, in the same order
+        :param output_tokens: If True, also return a list of tokens
+        :return: Phonemized text as a string, or a tuple of the string and a list of tokens
+        """
+        if not output_tokens:
+            return ''.join(phonemized)
+
+        tokens = [Token(*fields) for fields in Phonemizer._token_fields(separated, phonemized)]
+        return ''.join(token.phonemes for token in tokens), tokens
+
+    @staticmethod
+    def _token_fields(separated, phonemized):
+        # (graphemes, phonemes, language, whitespace) of every token of one text
+        for item, phonemized_text in zip(separated, phonemized):
+            lang = item["lang"] if "??" not in phonemized_text else "??"
+            yield item['text'], phonemized_text, lang, phonemized_text.endswith(" ")
+
+    @staticmethod
+    def _warn_unsupported():
+        warnings.warn(
+            "Your output contains unsupported languages, "
+            "<??> tags have been added to allow for manual filtering")
+
+    def phonemize(self, input_text, output_tokens=False, deadline_ms=None):
         """
         Phonemize the input text, handling multiple languages including CJK.
 
+        With a deadline, every segment goes to the best backend path expected to finish in time, judged from the
+        recent per-character latency of each path (see :meth:`estimate_cost`). English falls back from the
+        transformer pipeline to misaki without it ('fast'), then to OpenPhonemizer ('legacy'). Each token records
+        its path: 'default', a fallback name, 'cache', 'phoneme' or 'unsupported'. Fallback results are cached
+        separately from default ones.
+
         :param input_text: The input text to phonemize
         :param output_tokens: If True, return a list of dictionaries with text and language; if False, return a single string
+        :param deadline_ms: Optional latency budget for the whole call in milliseconds
         :return: Phonemized text as a string or list of dictionaries
         """
+        start = perf_counter()
         separated = self.seperate_languages(input_text)
-        result = []
+        if deadline_ms is None:
+            phonemized = [self.phonemize_for_language(item['text'], item['lang']) for item in separated]
+            output = self._build_output(separated, phonemized, output_tokens)
+        else:
+            phonemized, paths = self._phonemize_with_deadline(separated, start + deadline_ms / 1000)
+            output = self._build_output(separated, phonemized, output_tokens)
+            if output_tokens:
+                for token, path in zip(output[1], paths):
+                    token.path = path
 
-        for item in separated:
-            # if self.Tokenizer.detect_japanese_korean_chinese(item["text"]) != "??":
-            #     result.append(self._process_cjk_segment(item))
-            # else:
-            result.append(item)
+        if "<??>" in ''.join(phonemized):
+            self._warn_unsupported()
 
+        if self.metrics.enabled:
+            self.metrics.observe("phonemize.seconds", perf_counter() - start)
+        return output
 
-        phonemized_result = []
-        pure_phones = []
-        for item in result:
-            phonemized_text = self.phonemize_for_language(item['text'], item['lang'])
-            if output_tokens:
-                lang = item["lang"] if "??" not in phonemized_text else "??"
-                tokenOut = Token(item['text'], phonemized_text, lang, True if phonemized_text.endswith(" ") else False)
-                phonemized_result.append(tokenOut)
-                pure_phones.append(tokenOut.phonemes)
+    def phonemize_batch(self, texts, output_tokens=False, compact=False):
+        """
+        Phonemize many input texts at once.
+
+        Every text is separated into language segments first, then all segments of the same language
+        across the whole batch are sent to that language's phonemizer together. Backends with a
+        ``phonemize_batch`` method (English) then pay their per-call overhead once per language rather than
+        once per segment, the others are still called once per segment.
+
+        :param texts: An iterable of input texts
+        :param output_tokens: If True, each result is a tuple of the phonemized string and a list of tokens
+        :param compact: If True, return one ``TokenBatch`` holding the tokens of every text instead of a list,
+                        ``document_phonemes(i)`` gives the phonemized string of text i
+        :return: A list with one result per input text, each identical to what :meth:`phonemize` returns
+        """
+        start = perf_counter()
+        separated = self.seperate_languages_batch(list(texts))
+        by_lang = self._group_by_language(separated)
+        results = {lang: self._phonemize_segments([text for _, _, text in entries], lang)
+                   for lang, entries in by_lang.items()}
+        output = self._finish_batch(separated, by_lang, results, output_tokens, compact)
+
+        if self.metrics.enabled:
+            self.metrics.observe("phonemize.seconds", perf_counter() - start)
+        return output
+
+    def phonemize_stream(self, source, chunk_size=64, output_tokens=False, fmt=None, field="text", compact=False):
+        """
+        Lazily phonemize a corpus of any size.
+
+        Texts are read and phonemized ``chunk_size`` at a time with :meth:`phonemize_batch`, and the next chunk
+        is only read once the caller has consumed the previous one, so memory stays bounded.
+
+        :param source: A path to a text or JSONL file, or an iterable of strings or dictionaries
+        :param chunk_size: Number of texts phonemized together
+        :param output_tokens: If True, each result is a tuple of the phonemized string and a list of tokens
+        :param fmt: "text" or "jsonl", guessed from the file extension if None
+        :param field: The key holding the text in JSON objects and dictionaries
+        :param compact: If True, yield one ``TokenBatch`` per chunk instead of one result per text,
+                        ``TokenBatch.concatenate`` joins them
+        :return: A generator with one result per input text, in input order
+        """
+        for chunk in chunked(iter_texts(source, fmt=fmt, field=field), chunk_size):
+            if compact:
+                yield self.phonemize_batch(chunk, compact=True)
             else:
-                phonemized_result.append(phonemized_text)
-                pure_phones.append(phonemized_result)
+                yield from self.phonemize_batch(chunk, output_tokens=output_tokens)
 
-        fin = ''.join(pure_phones)
-        if "<??>" in fin:
-            warnings.warn(
-                "Your output contains unsupported languages, "
-                "<??> tags have been added to allow for manual filtering")
+    def phonemize_document(self, text, output_tokens=False, max_chunk_chars=1000, pool=None):
+        """
+        Phonemize a long document, such as a book chapter, in sentence-aligned chunks.
+
+        The document is split at sentence boundaries (``.!?`` followed by whitespace, ``。！？`` anywhere, never
+        inside language tags) into chunks of about ``max_chunk_chars`` characters. The chunks are phonemized
+        together with :meth:`phonemize_batch` in this process, or in parallel over the workers of ``pool``, and joined
+        back with the whitespace between them, which is not phonemized. A run of one language that crosses a chunk boundary comes back as a single token.
+
+        The output matches :meth:`phonemize` except where a backend's result depends on text beyond the sentence.
 
-        if output_tokens:
-            return fin, phonemized_result
+        :param text: The document
+        :param output_tokens: If True, return a tuple of the phonemized string and a list of tokens
+        :param max_chunk_chars: The preferred maximum chunk length, longer sentences are not split
+        :param pool: Optional ``VoPho.runner.PhonemizerPool`` to phonemize the chunks in parallel
+        :return: Output in the format of :meth:`phonemize`
+        """
+        ranges = self.Tokenizer.sentence_chunks(text, max_chunk_chars)
+        chunks = [text[start:end] for start, end in ranges]
+        if pool is not None:
+            batch_size = max(1, -(-len(chunks) // pool.processes))
+            results = pool.map(chunks, output_tokens=True, batch_size=batch_size)
         else:
-            return fin
+            results = self.phonemize_batch(chunks, output_tokens=True)
+
+        tokens = []
+        for index, (_, chunk_tokens) in enumerate(results):
+            chunk_tokens = list(chunk_tokens)
+            if tokens and chunk_tokens and tokens[-1].language == chunk_tokens[0].language != "??":
+                previous, first = tokens[-1], chunk_tokens.pop(0)
+                tokens[-1] = Token(previous.graphemes + first.graphemes, previous.phonemes + first.phonemes,
+                                   previous.language, first.whitespace)
+            tokens.extend(chunk_tokens)
+
+            # Whitespace between chunks stays with the token before it, as in seperate_languages
+            gap = text[ranges[index][1]:ranges[index + 1][0]] if index + 1 < len(ranges) else ""
+            if gap and tokens:
+                last = tokens[-1]
+                tokens[-1] = Token(last.graphemes + gap, last.phonemes + gap, last.language, True)
+
+        phonemes = ''.join(token.phonemes for token in tokens)
+        return (phonemes, tokens) if output_tokens else phonemes
+
+    async def aphonemize(self, input_text, output_tokens=False):
+        """
+        Phonemize the input text without blocking the event loop.
+
+        :param input_text: The input text to phonemize
+        :param output_tokens: If True, return a tuple of the phonemized string and a list of tokens
+        :return: The same result as :meth:`phonemize`
+        """
+        return (await self.aphonemize_batch([input_text], output_tokens=output_tokens))[0]
+
+    async def aphonemize_batch(self, texts, output_tokens=False, compact=False):
+        """
+        Phonemize many input texts without blocking the event loop.
+
+        Language separation runs on its own executor, and the segments of each language run on that
+        language's executor, so a slow backend only delays requests that need it.
+
+        :param texts: An iterable of input texts
+        :param output_tokens: If True, each result is a tuple of the phonemized string and a list of tokens
+        :param compact: If True, return one ``TokenBatch``, see :meth:`phonemize_batch`
+        :return: The same results as :meth:`phonemize_batch`
+        """
+        loop = asyncio.get_running_loop()
+        texts = list(texts)
+
+        separated = await loop.run_in_executor(
+            self.get_executor("tokenizer"), self.seperate_languages_batch, texts)
+        by_lang = self._group_by_language(separated)
+
+        results = {}
+        pending = {}
+        for lang, entries in by_lang.items():
+            segments = [text for _, _, text in entries]
+            if has_phonemizer(lang):
+                pending[lang] = loop.run_in_executor(self.get_executor(lang), self._phonemize_segments, segments, lang)
+            else:
+                # Phoneme passthrough and unsupported languages are plain string work
+                results[lang] = self._phonemize_segments(segments, lang)
+        results.update(zip(pending, await asyncio.gather(*pending.values())))
+
+        return self._finish_batch(separated, by_lang, results, output_tokens, compact)
+
+    def get_executor(self, lang):
+        """
+        Get or create the executor that runs work for the specified language.
+
+        Each language gets its own executor with ``executor_workers`` threads, which also keeps a
+        backend from being entered by more than that many threads at once.
+
+        :param lang: Language code, or "tokenizer" for language separation
+        :return: A ThreadPoolExecutor
+        """
+        if lang not in self._executors:
+            self._executors[lang] = ThreadPoolExecutor(max_workers=self.executor_workers,
+                                                       thread_name_prefix=f"vopho-{lang}")
+        return self._executors[lang]
+
+    def shutdown_executors(self, wait=True):
+        """
+        Shut down every executor created by the async API.
+
+        :param wait: Wait for queued work to finish before returning
+        """
+        executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=wait)
+
+    @staticmethod
+    def _group_by_language(separated):
+        """
+        Gather the segments of several separated texts by language.
+
+        :param separated: A list of results from :meth:`seperate_languages`
+        :return: A dictionary mapping each language to a list of (text index, segment index, segment text)
+        """
+        by_lang = {}
+        for doc_index, items in enumerate(separated):
+            for item_index, item in enumerate(items):
+                by_lang.setdefault(item['lang'], []).append((doc_index, item_index, item['text']))
+        return by_lang
+
+    def _finish_batch(self, separated, by_lang, results, output_tokens, compact=False):
+        """
+        Put per-language results back in their original positions and build the output of every text.
+        """
+        phonemized = [[None] * len(items) for items in separated]
+        for lang, entries in by_lang.items():
+            for (doc_index, item_index, _), result in zip(entries, results[lang]):
+                phonemized[doc_index][item_index] = result
+
+        if any("<??>" in result for doc in phonemized for result in doc):
+            self._warn_unsupported()
+
+        if compact:
+            return TokenBatch.from_segments(self._token_fields(items, doc) for items, doc in zip(separated, phonemized))
+        return [self._build_output(items, doc, output_tokens) for items, doc in zip(separated, phonemized)]
 
     def _process_cjk_segment(self, item):
         """
@@ -202,7 +960,6 @@ class Phonemizer:
 if __name__ == "__main__":
     input_text = "hello, 你好は中国語でこんにちはと言う意味をしています。مرحبا! Привет! नमस्ते!"
     engine = Phonemizer()
-    from time import time
 
     start = time()
     output = engine.phonemize(input_text, output_tokens=True)
@@ -1,11 +1,19 @@
+import gzip
 import json
 import os
 import warnings
 import re
 from langdetect.lang_detect_exception import LangDetectException
-from lingua import LanguageDetectorBuilder
+from lingua import IsoCode639_1, LanguageDetectorBuilder
 import random
+import threading
+from bisect import bisect_right
+from time import perf_counter
 from termcolor import colored
+from .tokens import Span
+from ..cache import SegmentCache
+from ..phonemizers import registered_languages
+from ..metrics import NULL_METRICS
 
 # Unicode ranges for various writing systems
 WRITING_SYSTEMS_UNICODE_RANGES = {
@@ -19,6 +27,92 @@ WRITING_SYSTEMS_UNICODE_RANGES = {
     'th': [(0x0E00, 0x0E7F)],  # Thai
 }
 
+# Writing systems by table code, 0 is no writing system. Lower codes win where ranges overlap
+SCRIPT_NAMES = (None,) + tuple(WRITING_SYSTEMS_UNICODE_RANGES)
+CJK_SCRIPT_CODES = frozenset(SCRIPT_NAMES.index(system) for system in ('zh', 'ja', 'ko'))
+# Script codes that are not a writing system of their own for is_punctuation
+PUNCTUATION_SCRIPT_CODES = CJK_SCRIPT_CODES | {0}
+
+
+def _build_script_tables():
+    # A byte per BMP code point, and sorted intervals for the astral planes
+    bmp = bytearray(0x10000)
+    astral = []
+    for code in range(len(SCRIPT_NAMES) - 1, 0, -1):
+        for start, end in WRITING_SYSTEMS_UNICODE_RANGES[SCRIPT_NAMES[code]]:
+            if start <= 0xFFFF:
+                stop = min(end, 0xFFFF) + 1
+                bmp[start:stop] = bytes([code]) * (stop - start)
+            if end > 0xFFFF:
+                astral.append((max(start, 0x10000), end, code))
+    astral.sort()
+    return bmp, [start for start, _, _ in astral], [end for _, end, _ in astral], [code for _, _, code in astral]
+
+
+BMP_SCRIPTS, ASTRAL_STARTS, ASTRAL_ENDS, ASTRAL_CODES = _build_script_tables()
+
+
+def script_code(char):
+    """
+    :param char: A single character
+    :return: The index of its writing system in ``SCRIPT_NAMES``, 0 if it belongs to none
+    """
+    code_point = ord(char)
+    if code_point <= 0xFFFF:
+        return BMP_SCRIPTS[code_point]
+    index = bisect_right(ASTRAL_STARTS, code_point) - 1
+    if index >= 0 and code_point <= ASTRAL_ENDS[index]:
+        return ASTRAL_CODES[index]
+    return 0
+
+
+# Stands in for the language of a span until its text has been through language detection
+_DETECT = object()
+
+# Characters that are never punctuation, even outside any writing system
+NOT_PUNCTUATION = frozenset("'\"(){}[]&")
+
+
+def _script_character_classes():
+    # The contents of a regex character class for every script code, read back from the script tables
+    ranges = {code: [] for code in range(1, len(SCRIPT_NAMES))}
+    start = 0
+    for code_point in range(1, 0x10001):
+        if code_point == 0x10000 or BMP_SCRIPTS[code_point] != BMP_SCRIPTS[start]:
+            if BMP_SCRIPTS[start]:
+                ranges[BMP_SCRIPTS[start]].append((start, code_point - 1))
+            start = code_point
+    for start, end, code in zip(ASTRAL_STARTS, ASTRAL_ENDS, ASTRAL_CODES):
+        ranges[code].append((start, end))
+    return {code: "".join(f"{re.escape(chr(start))}-{re.escape(chr(end))}" for start, end in code_ranges)
+            for code, code_ranges in ranges.items() if code_ranges}
+
+
+def _build_script_run_pattern():
+    """
+    One alternation that matches, at every position, the same segment split_text_by_writing_system used to build
+    a character at a time: a run of one non-CJK writing system, a run of alphanumeric CJK characters, a run of
+    characters outside every writing system that are not punctuation, or a single punctuation character.
+    """
+    classes = _script_character_classes()
+    not_punctuation = "".join(re.escape(char) for char in sorted(NOT_PUNCTUATION))
+    alternatives = [f"(?P<s{code}>[{character_class}]+)" for code, character_class in classes.items()
+                    if code not in CJK_SCRIPT_CODES]
+    cjk = "".join(classes[code] for code in sorted(CJK_SCRIPT_CODES) if code in classes)
+    alternatives.append(f"(?P<cjk>(?:(?=\\w)[{cjk}])+)")
+    alternatives.append(f"(?P<none>(?:(?![{''.join(classes.values())}])(?:[^\\W_]|[\\s{not_punctuation}]))+)")
+    alternatives.append("(?P<punctuation>.)")
+    return re.compile("|".join(alternatives), re.DOTALL)
+
+
+SCRIPT_RUN_PATTERN = _build_script_run_pattern()
+# Segment type for each group of SCRIPT_RUN_PATTERN
+SCRIPT_RUN_TYPES = {"cjk": "cjk", "none": None, "punctuation": "punctuation"}
+SCRIPT_RUN_TYPES.update({f"s{code}": SCRIPT_NAMES[code] for code in range(1, len(SCRIPT_NAMES))})
+
+# Format of the snapshots written by Tokenizer.save_detection_cache
+DETECTION_SNAPSHOT_VERSION = 1
+
 # Mapping of predefined language codes to specific colors
 LANGUAGE_COLORS = {
     'en': 'green',
@@ -37,6 +131,15 @@ LANGUAGE_COLORS = {
 
 unknown_language_colors = {}
 
+# Text the user already tagged with a language, e.g. <phoneme>...</phoneme>
+TAG_PATTERN = re.compile(r'<(\w+)>(.*?)</\1>', re.DOTALL)
+
+# Where a sentence may end: Latin terminators followed by whitespace, CJK terminators anywhere, closing quotes included
+SENTENCE_END_PATTERN = re.compile(r'[.!?]+[)"\'”’」』]*(?=\s)|[。！？]+[」』）”’]*')
+
+NON_CJK_WORD_PATTERN = re.compile(r'[\u4E00-\u9FFF\u3400-\u4DBF\uF900-\uFAFF\u3040-\u309F\u30A0-\u30FF\uAC00-\uD7AF。]'
+                                  r'+(?:\s*)|[\w.,!?;:\'"(){}\[\]\-–—\s]+')
+
 
 def random_color():
     colors = ['red', 'green', 'yellow', 'blue', 'magenta', 'cyan', 'white']
@@ -95,20 +198,121 @@ def manual_tag(sentence, manual_word_dict):
     return None  # Return None if no match is found
 
 
+def default_detection_languages():
+    """
+    The languages lingua chooses between by default: every registered backend language lingua knows, with 'cy'
+    (Cyrillic, phonemized as Russian) as 'ru'.
+
+    :return: A tuple of ISO 639-1 codes
+    """
+    languages = ("ru" if lang == "cy" else lang for lang in registered_languages())
+    return tuple(dict.fromkeys(lang for lang in languages if hasattr(IsoCode639_1, lang.upper())))
+
+
+def normalize_word(text):
+    """
+    The key a word or word window is cached under: lowercase, with runs of whitespace collapsed to one space.
+    """
+    return " ".join(text.lower().split())
+
+
 class Tokenizer:
-    def __init__(self):
+    def __init__(self, metrics=None, languages=None, low_accuracy=False, preload=False, cache_size=65536):
+        """
+        :param metrics: Optional ``VoPho.metrics.MetricsSink``
+        :param languages: ISO 639-1 codes lingua chooses between for Latin and Devanagari text, "all" for every
+                          language lingua knows, defaults to :func:`default_detection_languages` at construction
+        :param low_accuracy: Use lingua's low accuracy mode, faster and smaller but worse on short words
+        :param preload: Build the detector and load all its models now, instead of on the first detection
+        :param cache_size: Maximum number of normalized words whose detected language is remembered, 0 disables
+                           the detection cache. Clear it with ``detection_cache.clear()`` after editing
+                           ``manual_word_dict``
+        """
+        self.metrics = metrics if metrics is not None else NULL_METRICS
         self.min_confidence = 0.5
         self.manual_word_dict = load_manual_word_dict()
-        self.detector = LanguageDetectorBuilder.from_all_languages().build()
+        if languages is None:
+            languages = default_detection_languages()
+        if languages != "all":
+            languages = tuple("ru" if language == "cy" else language for language in languages)
+            if len(set(languages)) < 2:
+                raise ValueError("Language detection needs at least two candidate languages")
+            for language in languages:
+                if not hasattr(IsoCode639_1, language.upper()):
+                    raise ValueError(f"Unknown ISO 639-1 language code '{language}'")
+        self.detection_languages = languages
+        self.low_accuracy = low_accuracy
+        self.preload = preload
+        self._detector = None
+        self._detector_lock = threading.Lock()
+        self.detection_cache = SegmentCache(cache_size) if cache_size else None
+        if preload:
+            self.load_detector()
+
+    def _build_detector(self):
+        if self.detection_languages == "all":
+            builder = LanguageDetectorBuilder.from_all_languages()
+        else:
+            codes = {getattr(IsoCode639_1, language.upper()) for language in self.detection_languages}
+            builder = LanguageDetectorBuilder.from_iso_codes_639_1(*codes)
+        if self.low_accuracy:
+            builder = builder.with_low_accuracy_mode()
+        if self.preload:
+            builder = builder.with_preloaded_language_models()
+        return builder.build()
+
+    def load_detector(self):
+        """
+        Build the lingua detector if it has not been built yet, otherwise the first detection does.
+
+        :return: The detector
+        """
+        if self._detector is None:
+            with self._detector_lock:
+                if self._detector is None:
+                    start = perf_counter()
+                    self._detector = self._build_detector()
+                    if self.metrics.enabled:
+                        self.metrics.observe("detector.load.seconds", perf_counter() - start)
+        return self._detector
+
+    @property
+    def detector(self):
+        return self.load_detector()
+
+    @detector.setter
+    def detector(self, detector):
+        self._detector = detector
+
+    def _cached_detection(self, key):
+        language = self.detection_cache.get(key)
+        if self.metrics.enabled:
+            self.metrics.increment("detect.cache.hits" if language is not None else "detect.cache.misses")
+        return language
 
     def detect_language(self, text):
+        if self.detection_cache is None:
+            return self._detect_language(text)
+        key = normalize_word(text)
+        language = self._cached_detection(key)
+        if language is None:
+            language = self._detect_language(text)
+            self.detection_cache.put(key, language)
+        return language
+
+    def _detect_language(self, text):
         # Adjusted logic to improve language detection
         text_lower = text.lower().strip()
         manual_lang = manual_tag(text_lower, self.manual_word_dict)
         if manual_lang:
             return manual_lang
         try:
-            langs = self.detector.detect_language_of(text)
+            if self.metrics.enabled:
+                start = perf_counter()
+                langs = self.detector.detect_language_of(text)
+                self.metrics.observe("detect.seconds", perf_counter() - start)
+            else:
+                langs = self.detector.detect_language_of(text)
             if langs is not None:
                 langs = langs.iso_code_639_1.name.lower()
                 return langs
@@ -117,189 +321,326 @@ class Tokenizer:
         except LangDetectException:
             return '??'
 
+    def detect_languages(self, texts):
+        """
+        Detect the language of many texts with one parallel lingua call, see :meth:`detect_language`.
+
+        Texts matched by the manual word list or the detection cache are not sent to lingua, and repeated texts
+        are detected once.
+
+        :param texts: A list of texts
+        :return: A list with one language code (or '??') per text
+        """
+        if self.detection_cache is None:
+            return self._detect_languages(texts)
+        keys = [normalize_word(text) for text in texts]
+        results = [self._cached_detection(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            detected = self._detect_languages([texts[i] for i in missing])
+            for i, language in zip(missing, detected):
+                results[i] = language
+            self.detection_cache.put_many((keys[i], results[i]) for i in missing)
+        return results
+
+    def _detect_languages(self, texts):
+        results = [manual_tag(text.lower().strip(), self.manual_word_dict) for text in texts]
+        unique = list(dict.fromkeys(text for text, result in zip(texts, results) if not result))
+        if not unique:
+            return results
+
+        if self.metrics.enabled:
+            start = perf_counter()
+            detected = self.detector.detect_languages_in_parallel_of(unique)
+            self.metrics.observe("detect.seconds", perf_counter() - start)
+        else:
+            detected = self.detector.detect_languages_in_parallel_of(unique)
+        languages = {text: '??' if language is None else language.iso_code_639_1.name.lower()
+                     for text, language in zip(unique, detected)}
+        return [result or languages[text] for text, result in zip(texts, results)]
+
+    def save_detection_cache(self, path):
+        """
+        Write the detection cache to a gzipped JSON snapshot, e.g. to start other workers with what this one learned.
+
+        :param path: Destination file
+        :return: The number of saved entries
+        """
+        entries = self.detection_cache.items() if self.detection_cache is not None else []
+        snapshot = {
+            "version": DETECTION_SNAPSHOT_VERSION,
+            "languages": self._snapshot_languages(),
+            "low_accuracy": self.low_accuracy,
+            "entries": entries,
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+        return len(entries)
+
+    def load_detection_cache(self, path, skip_stale=True):
+        """
+        Load a snapshot written by :meth:`save_detection_cache` into the detection cache.
+
+        :param path: Source file
+        :param skip_stale: Load nothing if the snapshot was made with other candidate languages or accuracy mode
+        :return: The number of loaded entries
+        """
+        if self.detection_cache is None:
+            return 0
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if snapshot.get("version") != DETECTION_SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported detection snapshot version {snapshot.get('version')}")
+        if skip_stale and (snapshot["languages"] != self._snapshot_languages()
+                           or snapshot["low_accuracy"] != self.low_accuracy):
+            return 0
+        entries = snapshot["entries"][-self.detection_cache.maxsize:]
+        self.detection_cache.put_many((key, language) for key, language in entries)
+        return len(entries)
+
+    def _snapshot_languages(self):
+        if self.detection_languages == "all":
+            return "all"
+        return sorted(set(self.detection_languages))
+
     def is_writing_system(self, char, system):
         if len(char) > 1:
-            # Valid punctuation characters, including space
-            return all(self.is_writing_system(c) for c in char)  # Check each character individually
-        else:
-            code_point = ord(char)
-            return any(start <= code_point <= end for start, end in WRITING_SYSTEMS_UNICODE_RANGES.get(system, []))
+            return all(self.is_writing_system(c, system) for c in char)  # Check each character individually
+        code = script_code(char)
+        return code != 0 and SCRIPT_NAMES[code] == system
 
     def detect_japanese_korean_chinese(self, text):
-        is_japanese = any(self.is_writing_system(char, 'ja') for char in text)
-        is_korean = any(self.is_writing_system(char, 'ko') for char in text)
-        is_chinese = any(self.is_writing_system(char, 'zh') for char in text)
-
-        if is_japanese:
-            return "ja"
-        elif is_korean:
-            return "ko"
-        elif is_chinese:
-            return "zh"
-        else:
-            return "??"
+        codes = set(map(script_code, text))
+        for system in ("ja", "ko", "zh"):
+            if SCRIPT_NAMES.index(system) in codes:
+                return system
+        return "??"
 
     def detect_writing_system(self, text):
-        for system, ranges in WRITING_SYSTEMS_UNICODE_RANGES.items():
-            if any(ord(char) in range(start, end + 1) for char in text for start, end in ranges):
-                if system not in ["zh", "ja", "ko"]:
-                    return system
-                else:
-                    return "cjk"
-        return None
+        # The first system in WRITING_SYSTEMS_UNICODE_RANGES that any character belongs to
+        code = min(filter(None, map(script_code, text)), default=0)
+        if code == 0:
+            return None
+        return "cjk" if code in CJK_SCRIPT_CODES else SCRIPT_NAMES[code]
 
     def is_punctuation(self, char):
-        not_punctuation = ["'", '"', "(", ")", "{", "}", "[", "]", "&"]
         if len(char) > 1:
-            # Valid punctuation characters, including space
             return all(self.is_punctuation(c) for c in char)  # Check each character individually
-        else:
-            # Single character check (as per your original logic)
-            return (not char.isalnum()  # Is not alphanumeric
-                    and not char.isspace()  # Is not whitespace
-                    and not self.is_writing_system(char, self.detect_writing_system(char))
-                    and char not in not_punctuation)  # Is not in a writing system                                                                             self.detect_writing_system(
+        # Symbols outside any writing system, and non-alphanumeric characters in the CJK ranges
+        return (not char.isalnum()
+                and not char.isspace()
+                and char not in NOT_PUNCTUATION
+                and script_code(char) in PUNCTUATION_SCRIPT_CODES)
 
     def split_text_by_writing_system(self, text):
-        segments = []
-        current_segment = ""
-        current_type = None
-
-        for char in text:
-            if self.is_punctuation(char):
-                if current_segment:
-                    segments.append((current_segment, current_type))
-                    current_segment = ""
-                segments.append((char, "punctuation"))
-                current_type = None
-            else:
-                char_system = self.detect_writing_system(char)
-                if char_system != current_type:
-                    if current_segment:
-                        segments.append((current_segment, current_type))
-                    current_type = char_system
-                    current_segment = char
-                else:
-                    current_segment += char
+        """
+        Split text into runs of one writing system ("cjk" for Chinese, Japanese and Korean, None for none) and
+        single punctuation characters ("punctuation"). A lone space takes the type of the segment before it.
 
-        if current_segment:
-            segments.append((current_segment, current_type))
-
-        outseg = []
+        :return: A list of (segment, type) tuples covering text
+        """
+        segments = []
         prior = None
-        for seg, _ in segments:
-            if seg == " ":
-                outseg.append((seg, prior))
+        for match in SCRIPT_RUN_PATTERN.finditer(text):
+            segment = match.group()
+            if segment == " ":
+                segments.append((segment, prior))
             else:
-                prior = _
-                outseg.append((seg, _))
-
-        return outseg
+                prior = SCRIPT_RUN_TYPES[match.lastgroup]
+                segments.append((segment, prior))
+        return segments
 
     @staticmethod
     def split_non_cjk_in_segment(text):
-        return re.findall(r'[\u4E00-\u9FFF\u3400-\u4DBF\uF900-\uFAFF\u3040-\u309F\u30A0-\u30FF\uAC00-\uD7AF。]'
-                          r'+(?:\s*)|[\w.,!?;:\'"(){}\[\]\-–—\s]+', text)
+        return NON_CJK_WORD_PATTERN.findall(text)
 
-    def _tokenize(self, text):
+    def _find_runs(self, text, offset=0):
+        """
+        Find the language runs of untagged text, positioned relative to the original input, leaving the language of Latin words and Devanagari runs to be
+        detected later, so the words of many texts can go through lingua together.
+
+        :return: The spans covering ``text``, and the texts to detect for the spans whose language is ``_DETECT``
+        """
         segments = self.split_text_by_writing_system(text)
 
-        processed_segments = []
+        spans = []
+        detect = []
+        pos = offset
 
         for segment, seg_type in segments:
+            start, pos = pos, pos + len(segment)
+            if not segment.strip() or seg_type == "punctuation":
+                continue
             if seg_type == "cjk":
-                lang = self.detect_japanese_korean_chinese(segment)
-                processed_segments.append(f"<{lang}>{segment}</{lang}>")
+                spans.append(Span(start, pos, self.detect_japanese_korean_chinese(segment)))
             elif seg_type in WRITING_SYSTEMS_UNICODE_RANGES:
                 if seg_type != "deva":
-                    processed_segments.append(f"<{seg_type}>{segment}</{seg_type}>")
-                else:
-                    lang = self.detect_language(segment)
-                    processed_segments.append(f"<{lang}>{segment.strip()}</{lang}>")
-            elif seg_type == "punctuation":
-                processed_segments.append(f"<punctuation>{segment}</punctuation>")
-
-            else:
-                words = self.split_non_cjk_in_segment(segment)
-                current_lang = None
-                current_segment = ""
-
-                for word in words:
-                    if self.is_punctuation(word):
-                        if current_segment:
-                            processed_segments.append(f"<{current_lang}>{current_segment.strip()}</{current_lang}>")
-                            current_segment = ""
-                        processed_segments.append(f"<punctuation>{word}</punctuation>")
-                        current_lang = None
-                    else:
-                        lang = self.detect_language(word)
-                        if lang != current_lang:
-                            if current_segment:
-                                processed_segments.append(
-                                    f"<{current_lang}>{current_segment.strip()}</{current_lang}>")
-                                current_segment = ""
-                            current_lang = lang
-                        current_segment += word + " "
-
-                # Handle any remaining text
-                if current_segment:
-                    processed_segments.append(f"<{current_lang}>{current_segment.strip()}</{current_lang}>")
-
-        return "".join(processed_segments)
-
-    def _group_segments(self, text):
-        pattern = r'(<(\w+)>.*?</\2>|<punctuation>.*?</punctuation>)'
-        tokens = re.findall(pattern, text)
-
-        grouped_segments = []
-        current_lang = None
-        current_content = []
-
-        for segment, lang in tokens:
-            if lang:
-                content = re.search(r'<\w+>(.*?)</\w+>', segment).group(1)
-                if lang == current_lang:
-                    current_content.append(content)
+                    spans.append(Span(start, pos, seg_type))
                 else:
-                    if current_content:
-                        grouped_segments.append(f"<{current_lang}>{''.join(current_content)}</{current_lang}>")
-                    current_lang = lang
-                    current_content = [content]
+                    spans.append(self._strip_span(segment, start, _DETECT))
+                    detect.append(segment)
             else:
-                if current_content:
-                    current_content[-1] += segment
-                else:
-                    grouped_segments.append(segment)
+                for match in NON_CJK_WORD_PATTERN.finditer(segment):
+                    word = match.group()
+                    if not word.strip() or self.is_punctuation(word):
+                        continue
+                    spans.append(self._strip_span(word, start + match.start(), _DETECT))
+                    detect.append(word)
 
-        if current_content:
-            grouped_segments.append(f"<{current_lang}>{''.join(current_content)}</{current_lang}>")
+        return self._fill_gaps(spans, offset, offset + len(text)), detect
 
-        # Clean up punctuation handling
-        return ''.join(grouped_segments) \
-            .replace("<punctuation>", "") \
-            .replace("</punctuation>", " ") \
-            .replace("  ", " ").strip()
+    @staticmethod
+    def _resolve(spans, languages):
+        # Fill in detected languages, in the order _find_runs asked for them
+        return [Span(span.start, span.end, next(languages)) if span.lang is _DETECT else span for span in spans]
 
-    def tokenize(self, text, group=True):
-        # Split the input text into segments based on existing tags
-        pattern = r'(<\w+>.*?</\w+>)|([^<]+)'  # Matches either tagged segments or untagged text
-        segments = re.findall(pattern, text)
+    @staticmethod
+    def _strip_span(segment, start, lang):
+        leading = len(segment) - len(segment.lstrip())
+        return Span(start + leading, start + len(segment.rstrip()), lang)
+
+    @staticmethod
+    def _fill_gaps(spans, start, end):
+        # Everything between language runs becomes a span without a language
+        filled = []
+        pos = start
+        for span in spans:
+            if span.start > pos:
+                filled.append(Span(pos, span.start))
+            filled.append(span)
+            pos = span.end
+        if end > pos:
+            filled.append(Span(pos, end))
+        return filled
 
-        processed_segments = []
+    @staticmethod
+    def _group_spans(text, spans):
+        """
+        Merge touching spans of the same language, including runs separated only by whitespace.
+        """
+        grouped = []
+        whitespace = []  # Whitespace-only spans following the last language run
+
+        def append(span):
+            if grouped and grouped[-1].lang == span.lang and grouped[-1].end == span.start:
+                grouped[-1] = Span(grouped[-1].start, span.end, span.lang)
+            else:
+                grouped.append(span)
+
+        for span in spans:
+            if span.lang is None and grouped and grouped[-1].lang is not None \
+                    and text[span.start:span.end].isspace():
+                whitespace.append(span)
+                continue
+            if span.lang is not None and grouped and grouped[-1].lang == span.lang and whitespace \
+                    and grouped[-1].end == whitespace[0].start and whitespace[-1].end == span.start:
+                # Absorb the whitespace into the language run
+                grouped[-1] = Span(grouped[-1].start, span.end, span.lang)
+            else:
+                for pending in whitespace:
+                    append(pending)
+                append(span)
+            whitespace = []
+
+        for pending in whitespace:
+            append(pending)
+        return grouped
+
+    def spans(self, text, group=True):
+        """
+        Split text into language runs over the original string.
+
+        Text wrapped in language tags (e.g. ``<phoneme>...</phoneme>``) keeps that language, the tags themselves
+        are not covered by any span.
+
+        :param text: The input text
+        :param group: Merge neighbouring runs of the same language
+        :return: A list of spans, in order
+        """
+        return self.spans_batch([text], group=group)[0]
+
+    def spans_batch(self, texts, group=True):
+        """
+        Split many texts into language runs, see :meth:`spans`. The Latin words of all texts are detected
+        together in one parallel lingua call.
+
+        :param texts: A list of input texts
+        :param group: Merge neighbouring runs of the same language
+        :return: A list of span lists, one per text
+        """
+        found = [self._find_tagged_runs(text) for text in texts]
+        languages = iter(self.detect_languages([word for _, detect in found for word in detect]))
+
+        results = []
+        for text, (spans, _) in zip(texts, found):
+            spans = self._resolve(spans, languages)
+            if group:
+                spans = self._group_spans(text, spans)
+            results.append(spans)
+        return results
+
+    def _find_tagged_runs(self, text):
+        spans = []
+        detect = []
+        pos = 0
+
+        for match in TAG_PATTERN.finditer(text):
+            untagged, words = self._find_runs(text[pos:match.start()], pos)
+            spans.extend(untagged)
+            detect.extend(words)
+            if match.end(2) > match.start(2):
+                spans.append(Span(match.start(2), match.end(2), match.group(1)))
+            pos = match.end()
+        untagged, words = self._find_runs(text[pos:], pos)
+        spans.extend(untagged)
+        detect.extend(words)
+        return spans, detect
 
-        for tagged_segment, untagged_segment in segments:
-            if tagged_segment:  # If this segment is already tagged, just add it
-                processed_segments.append(tagged_segment)
-            else:  # If the segment is untagged, process it as usual
-                result = self._tokenize(untagged_segment)
-                processed_segments.append(result)
+    @staticmethod
+    def render(text, spans):
+        """
+        Render spans as a string with language tags, e.g. ``<en>hello</en>, <ja>世界</ja>``.
+        """
+        return "".join(text[span.start:span.end] if span.lang is None
+                       else f"<{span.lang}>{text[span.start:span.end]}</{span.lang}>"
+                       for span in spans)
 
-        result = ''.join(processed_segments)
+    @staticmethod
+    def sentence_chunks(text, max_chars=1000):
+        """
+        Split a long document at sentence boundaries, never inside language tags.
+
+        Sentences are packed into chunks of at most ``max_chars`` characters, a sentence longer than that is
+        a chunk of its own. The whitespace between two chunks belongs to neither.
+
+        :param text: The document
+        :param max_chars: The preferred maximum chunk length
+        :return: A list of (start, end) ranges into text
+        """
+        tags = [match.span() for match in TAG_PATTERN.finditer(text)]
+        ends = [match.end() for match in SENTENCE_END_PATTERN.finditer(text)
+                if not any(start < match.end() < end for start, end in tags)]
+
+        chunks = []
+        start = 0
+        for end in ends + [len(text)]:
+            if end <= start:
+                continue
+            if chunks and end - chunks[-1][0] <= max_chars:
+                chunks[-1] = (chunks[-1][0], end)
+            else:
+                chunks.append((start, end))
+            # The next sentence starts after the whitespace following this one
+            start = end
+            while start < len(text) and text[start].isspace():
+                start += 1
+        return chunks
 
-        if group:
-            result = self._group_segments(result)
+    def tokenize(self, text, group=True):
+        spans = self.spans(text, group=group)
+        result = self.render(text, spans).strip()
 
-        if "<??>" in result:
+        if any(span.lang == "??" for span in spans):
             warnings.warn(
                 "Your output contains tokenization errors. We were unable to detect a language or writing system, or there was an error in processing.")
 
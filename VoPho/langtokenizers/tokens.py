@@ -1,3 +1,4 @@
+from array import array
 from dataclasses import dataclass
 
 
@@ -9,3 +10,158 @@ class Token:
     whitespace: bool
     start_second: float = 0
     end_second: float = 0
+    path: str = None  # Backend path that produced the phonemes when a deadline was given, see Phonemizer.phonemize
+
+
+@dataclass(frozen=True)
+class Span:
+    """
+    A run of the original text, ``text[start:end]``, in one language.
+
+    ``lang`` is None for punctuation and whitespace between language runs.
+    """
+    start: int
+    end: int
+    lang: str = None
+
+
+class TokenBatch:
+    """
+    The tokens of many documents stored column by column, for holding whole corpora in memory.
+
+    Graphemes and phonemes are kept as two concatenated strings with offset arrays, languages as one byte per
+    token indexing ``language_table``, and whitespace as one byte per token. Indexing or iterating creates
+    :class:`Token` views on demand.
+    """
+    __slots__ = ("graphemes", "phonemes", "grapheme_offsets", "phoneme_offsets", "languages", "language_table",
+                 "whitespace", "document_offsets")
+
+    def __init__(self):
+        self.graphemes = ""
+        self.phonemes = ""
+        self.grapheme_offsets = array("Q", [0])
+        self.phoneme_offsets = array("Q", [0])
+        self.languages = array("B")
+        self.language_table = []
+        self.whitespace = bytearray()
+        self.document_offsets = array("Q", [0])
+
+    @classmethod
+    def from_segments(cls, documents):
+        """
+        Build a batch without creating any Token objects.
+
+        :param documents: An iterable of documents, each an iterable of (graphemes, phonemes, language, whitespace)
+        :return: A TokenBatch
+        """
+        batch = cls()
+        codes = {}
+        graphemes = []
+        phonemes = []
+        grapheme_end = phoneme_end = 0
+        for document in documents:
+            for grapheme_text, phoneme_text, language, whitespace in document:
+                code = codes.get(language)
+                if code is None:
+                    code = codes[language] = len(batch.language_table)
+                    batch.language_table.append(language)
+                graphemes.append(grapheme_text)
+                phonemes.append(phoneme_text)
+                grapheme_end += len(grapheme_text)
+                phoneme_end += len(phoneme_text)
+                batch.grapheme_offsets.append(grapheme_end)
+                batch.phoneme_offsets.append(phoneme_end)
+                batch.languages.append(code)
+                batch.whitespace.append(bool(whitespace))
+            batch.document_offsets.append(len(batch.languages))
+        batch.graphemes = "".join(graphemes)
+        batch.phonemes = "".join(phonemes)
+        return batch
+
+    @classmethod
+    def from_tokens(cls, documents):
+        """
+        :param documents: An iterable of lists of tokens
+        :return: A TokenBatch
+        """
+        return cls.from_segments(((token.graphemes, token.phonemes, token.language, token.whitespace)
+                                  for token in document) for document in documents)
+
+    @classmethod
+    def concatenate(cls, batches):
+        """
+        Join batches into one, e.g. the batches yielded by ``Phonemizer.phonemize_stream(..., compact=True)``.
+
+        The columns are joined directly: offsets are shifted and language codes remapped, no Token is created.
+        """
+        result = cls()
+        codes = {}
+        graphemes = []
+        phonemes = []
+        for batch in batches:
+            remap = bytearray(range(256))
+            for code, language in enumerate(batch.language_table):
+                if language not in codes:
+                    codes[language] = len(result.language_table)
+                    result.language_table.append(language)
+                remap[code] = codes[language]
+
+            grapheme_base = result.grapheme_offsets[-1]
+            phoneme_base = result.phoneme_offsets[-1]
+            token_base = len(result.languages)
+            result.grapheme_offsets.extend(offset + grapheme_base for offset in batch.grapheme_offsets[1:])
+            result.phoneme_offsets.extend(offset + phoneme_base for offset in batch.phoneme_offsets[1:])
+            result.document_offsets.extend(offset + token_base for offset in batch.document_offsets[1:])
+            result.languages.frombytes(batch.languages.tobytes().translate(remap))
+            result.whitespace += batch.whitespace
+            graphemes.append(batch.graphemes)
+            phonemes.append(batch.phonemes)
+        result.graphemes = "".join(graphemes)
+        result.phonemes = "".join(phonemes)
+        return result
+
+    def __len__(self):
+        return len(self.languages)
+
+    @property
+    def document_count(self):
+        return len(self.document_offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("token index out of range")
+        return Token(self.graphemes[self.grapheme_offsets[index]:self.grapheme_offsets[index + 1]],
+                     self.phonemes[self.phoneme_offsets[index]:self.phoneme_offsets[index + 1]],
+                     self.language_table[self.languages[index]],
+                     bool(self.whitespace[index]))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def _document_range(self, index):
+        if index < 0:
+            index += self.document_count
+        if not 0 <= index < self.document_count:
+            raise IndexError("document index out of range")
+        return self.document_offsets[index], self.document_offsets[index + 1]
+
+    def document(self, index):
+        """
+        :return: The tokens of one document as a list of Token views
+        """
+        start, end = self._document_range(index)
+        return [self[token] for token in range(start, end)]
+
+    def document_phonemes(self, index):
+        """
+        :return: The phonemized text of one document, as ``Phonemizer.phonemize`` returns it
+        """
+        start, end = self._document_range(index)
+        return self.phonemes[self.phoneme_offsets[start]:self.phoneme_offsets[end]]
+
+    def document_graphemes(self, index):
+        start, end = self._document_range(index)
+        return self.graphemes[self.grapheme_offsets[start]:self.grapheme_offsets[end]]
@@ -0,0 +1,29 @@
+import gc
+import os
+import sys
+
+try:
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+
+def resident_bytes():
+    """
+    :return: The resident set size of this process in bytes, or None where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def release_memory():
+    """
+    Collect garbage and, if torch is already imported, return cached CUDA memory to the driver.
+    """
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
@@ -0,0 +1,129 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds of the histogram buckets kept by InMemoryMetrics, in seconds and in characters
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_SIZE_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+class MetricsSink:
+    """
+    Receives counters and observations from the engine, tokenizer and backends.
+
+    Subclass it and override :meth:`increment` and :meth:`observe` to forward metrics to Prometheus, StatsD
+    or a log. The engine only measures anything when ``enabled`` is True.
+
+    Metrics emitted:
+      - ``phonemize.seconds``: one call to phonemize or phonemize_batch
+      - ``tokenize.seconds``: language separation of one text, or of a whole batch
+      - ``detect.seconds``: one lingua detection call, for one word or for all the words of a batch
+      - ``detector.load.seconds``: building the lingua detector, on first use unless preloaded
+      - ``detect.cache.hits`` / ``detect.cache.misses``: word detection cache lookups
+      - ``backend.load.seconds`` (lang): constructing a backend
+      - ``backend.seconds`` (lang): one backend call
+      - ``backend.unloads`` (lang, reason): backends unloaded for being idle, over the memory budget or manually
+      - ``segments`` (lang) and ``segment.chars`` (lang): segments phonemized and their length
+      - ``segments.deduplicated`` (lang): repeated segments of a batch that were not phonemized again
+      - ``cache.hits`` / ``cache.misses`` (lang): segment cache lookups
+      - ``unsupported`` (lang): segments returned wrapped in <??> tags
+      - ``deadline.fallbacks`` (lang, path): segments sent to a cheaper backend path to meet a deadline
+
+    Backend metrics tag fallback backends as "lang:path", e.g. ``en:fast``.
+    """
+    enabled = True
+
+    def increment(self, name, value=1, **tags):
+        pass
+
+    def observe(self, name, value, **tags):
+        pass
+
+
+class NullMetrics(MetricsSink):
+    """
+    The default sink, which tells the engine not to measure anything.
+    """
+    enabled = False
+
+
+NULL_METRICS = NullMetrics()
+
+
+class CallbackMetrics(MetricsSink):
+    """
+    Forwards every metric to a callback ``callback(kind, name, value, tags)``, where kind is "counter" or "observation".
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def increment(self, name, value=1, **tags):
+        self.callback("counter", name, value, tags)
+
+    def observe(self, name, value, **tags):
+        self.callback("observation", name, value, tags)
+
+
+class InMemoryMetrics(MetricsSink):
+    """
+    Keeps counters and bucketed histograms in memory, read them with :meth:`snapshot`.
+
+    Metrics whose name ends in ``.chars`` use ``size_buckets``, all others use ``buckets``.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, size_buckets=DEFAULT_SIZE_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.size_buckets = tuple(size_buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, tags):
+        return (name,) + tuple(sorted(tags.items()))
+
+    def increment(self, name, value=1, **tags):
+        key = self._key(name, tags)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def _bounds(self, name):
+        return self.size_buckets if name.endswith(".chars") else self.buckets
+
+    def observe(self, name, value, **tags):
+        key = self._key(name, tags)
+        bounds = self._bounds(name)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"count": 0, "sum": 0.0, "buckets": [0] * (len(bounds) + 1)}
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["buckets"][bisect_left(bounds, value)] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _format(key):
+        name, tags = key[0], key[1:]
+        if not tags:
+            return name
+        return name + "{" + ",".join(f"{tag}={value}" for tag, value in tags) + "}"
+
+    def snapshot(self):
+        """
+        :return: A dictionary with "counters" and "histograms", keyed like ``backend.seconds{lang=en}``.
+                 Histogram buckets map each upper bound to the number of observations up to it (and above the
+                 previous bound), "+Inf" counts the rest.
+        """
+        with self._lock:
+            return {
+                "counters": {self._format(key): value for key, value in self._counters.items()},
+                "histograms": {self._format(key): {"count": histogram["count"], "sum": histogram["sum"],
+                                                   "buckets": dict(zip(self._bounds(key[0]) + ("+Inf",),
+                                                                       histogram["buckets"]))}
+                               for key, histogram in self._histograms.items()},
+            }
@@ -0,0 +1,116 @@
+"""
+Language backends, and the registry the engine uses to build them the first time a language is needed.
+
+Backend modules are only imported by their factory, so importing the engine does not pull in torch,
+misaki, cutlet or any other backend dependency until that language actually shows up.
+"""
+
+_REGISTRY = {}
+
+
+def register_phonemizer(lang, factory, distributions=(), version=None, sample="", reentrant=False, fallbacks=None):
+    """
+    Register a phonemizer backend for a language, replacing any existing one.
+
+    :param lang: Language ID produced by the tokenizer (e.g. 'en', 'cy') or used in language tags
+    :param factory: Callable taking the engine's Phonemizer and returning an object with a ``phonemize(text)``
+                    method (and optionally ``phonemize_batch(texts)``)
+    :param distributions: Names of installed distributions whose versions change the backend's output
+    :param version: Optional version string of the backend itself
+    :param sample: A short text in the language, phonemized once when warming the backend up
+    :param reentrant: Whether one instance may be called from several threads at once. Engines in
+                      ``thread_safe`` mode give every thread its own instance of backends that are not reentrant
+    :param fallbacks: Optional dictionary of cheaper backends the engine may use to meet a deadline, mapping a
+                      path name to a factory, from the most to the least expensive
+    """
+    _REGISTRY[lang] = {
+        "factory": factory,
+        "distributions": tuple(distributions),
+        "version": version,
+        "sample": sample,
+        "reentrant": reentrant,
+        "fallbacks": dict(fallbacks or {}),
+    }
+
+
+def unregister_phonemizer(lang):
+    _REGISTRY.pop(lang, None)
+
+
+def has_phonemizer(lang):
+    return lang in _REGISTRY
+
+
+def registered_languages():
+    return tuple(_REGISTRY)
+
+
+def get_registration(lang):
+    """
+    :param lang: Language ID
+    :return: The registration dictionary (factory, distributions, version, sample, reentrant, fallbacks), or None if
+             not registered
+    """
+    return _REGISTRY.get(lang)
+
+
+def create_phonemizer(lang, engine, path="default"):
+    """
+    Build the backend registered for a language.
+
+    :param lang: Language ID
+    :param engine: The engine Phonemizer, whose settings (stress, legacy, working_path) the factory may read
+    :param path: "default" for the main backend, or the name of one of its fallbacks
+    :return: A new backend instance, or None if no backend is registered for the language
+    """
+    registration = _REGISTRY.get(lang)
+    if registration is None:
+        return None
+    if path == "default":
+        return registration["factory"](engine)
+    return registration["fallbacks"][path](engine)
+
+
+def _english(engine):
+    from .english import Phonemizer
+    return Phonemizer(stress=engine.stress, legacy=engine.legacy)
+
+
+def _english_fast(engine):
+    from .english import Phonemizer
+    return Phonemizer(stress=engine.stress, trf=False)
+
+
+def _english_legacy(engine):
+    from .english import Phonemizer
+    return Phonemizer(stress=engine.stress, legacy=True)
+
+
+def _japanese(engine):
+    from .japanese import Phonemizer
+    return Phonemizer()
+
+
+def _mandarin(engine):
+    from .mandarin import Phonemizer
+    return Phonemizer()
+
+
+def _russian(engine):
+    from .russian import Phonemizer
+    return Phonemizer(working_path=engine.working_path, stress=engine.stress)
+
+
+def _thai(engine):
+    from .thai import Phonemizer
+    return Phonemizer()
+
+
+# misaki/spaCy, cutlet/MeCab and RUAccent keep per-call state in their instances; pypinyin, jieba and pythainlp do not
+register_phonemizer('en', _english, distributions=('misaki', 'openphonemizer'), sample="Hello, world.",
+                    fallbacks={"fast": _english_fast, "legacy": _english_legacy})
+register_phonemizer('ja', _japanese, distributions=('cutlet', 'unidic-lite'), sample="こんにちは、世界。")
+register_phonemizer('zh', _mandarin, distributions=('pypinyin', 'jieba', 'cn2an'), sample="你好，世界。", reentrant=True)
+register_phonemizer('cy', _russian, distributions=('ruphon', 'ruaccent'),  # cyrillic treated as russian
+                    sample="Привет, мир.")
+register_phonemizer('th', _thai, distributions=('pythainlp',), sample="สวัสดีชาวโลก", reentrant=True)
@@ -1,5 +1,6 @@
 import os
 import re
+import threading
 
 import nltk
 from misaki import en
@@ -291,19 +292,21 @@ class OpenPhonemiserFallback:
 
 ### BASE PHONEMEISER CLASS
 class Phonemizer:
-    def __init__(self, manual_fixes=None, allow_heteronyms=True, stress=False, legacy=False):
+    def __init__(self, manual_fixes=None, allow_heteronyms=True, stress=False, legacy=False, trf=True):
         self.legacy = legacy
         if manual_fixes is None:
             manual_fixes = manual_phonemizations
         if not legacy:
             self.backend = OpenPhonemizer()
             self.fallback = OpenPhonemiserFallback(backend=self.backend)
-            self.phonemizer = en.G2P(trf=True, british=False, fallback=self.fallback)
+            self.phonemizer = en.G2P(trf=trf, british=False, fallback=self.fallback)
         else:
             self.phonemizer = OpenPhonemizer()
         self.manual_phonemizations = manual_fixes
         self.allow_heteronyms = allow_heteronyms
         self.stress = stress
+        # Serialises batches, which hand misaki pre-parsed documents by swapping its spaCy pipeline
+        self._batch_lock = threading.Lock()
         self.manual_filters = {
             " . . . ": "... ",
             " . ": ". "
@@ -359,6 +362,36 @@ class Phonemizer:
 
         return self.postprocess(phonemized_text)
 
+    def phonemize_batch(self, texts, batch_size=64):
+        """
+        Phonemize many texts, parsing all of them with one ``nlp.pipe`` run of misaki's spaCy pipeline instead of
+        one spaCy call per text.
+
+        :param texts: A list of texts
+        :param batch_size: Number of texts spaCy parses at once
+        :return: A list with the phonemized text of each input
+        """
+        if self.legacy or not hasattr(self.phonemizer, "nlp"):
+            return [self.phonemize(text) for text in texts]
+
+        # The exact strings misaki will hand to spaCy for every piece outside <phoneme> tags
+        g2p_preprocess = type(self.phonemizer).preprocess
+        pieces = {}
+        for text in texts:
+            segments = self.phoneme_tag_pattern.split(self.preprocess(text))
+            for segment in segments[::2]:
+                if segment:
+                    pieces[g2p_preprocess(segment)[0]] = None
+
+        # Read and restore the pipeline under the lock, so no batch ever takes another batch's stand-in for it
+        with self._batch_lock:
+            nlp = self.phonemizer.nlp
+            docs = dict(zip(pieces, nlp.pipe(list(pieces), batch_size=batch_size)))
+            self.phonemizer.nlp = lambda text: docs[text] if text in docs else nlp(text)
+            try:
+                return [self.phonemize(text) for text in texts]
+            finally:
+                self.phonemizer.nlp = nlp
 
 if __name__ == "__main__":
     phonem = Phonemizer(stress=True, legacy=True)
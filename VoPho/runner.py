@@ -0,0 +1,233 @@
+import gc
+import logging
+import multiprocessing
+import os
+import sys
+from collections import deque
+from contextlib import contextmanager
+
+from .corpus import chunked
+
+# Environment variables read by the BLAS/OpenMP runtimes when they are first loaded
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+logger = logging.getLogger(__name__)
+
+# The Phonemizer owned by the current worker process, or the error raised while building it
+_engine = None
+_init_error = None
+
+
+@contextmanager
+def _thread_env(threads):
+    """
+    Temporarily export thread limits so that child processes inherit them before loading torch or BLAS.
+    """
+    previous = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    os.environ.update({name: str(threads) for name in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _limit_threads(threads):
+    os.environ.update({name: str(threads) for name in THREAD_ENV_VARS})
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(threads)
+    except RuntimeError:
+        # Can only be set once, before any parallel work has started
+        pass
+
+
+def _init_worker(phonemizer_kwargs, languages, threads):
+    global _engine, _init_error
+    if threads:
+        _limit_threads(threads)
+
+    from .engine import Phonemizer
+
+    try:
+        _engine = Phonemizer(preload=languages, **phonemizer_kwargs)
+    except Exception as error:
+        # A failing initializer makes the pool respawn workers forever, report it with the first task instead
+        _init_error = error
+
+
+def _init_forked_worker(threads):
+    # The Phonemizer was inherited from the parent
+    if threads:
+        _limit_threads(threads)
+
+
+def _share_torch_memory(obj, depth=12, seen=None):
+    """
+    Move the weights of every torch module reachable from obj into shared memory.
+
+    The walk has to be deep: misaki's spaCy transformer sits at G2P -> nlp -> _components -> (name, pipe) ->
+    pipe.model -> shims -> PyTorchShim._model, below the backend and its wrapper.
+
+    :return: The number of modules moved
+    """
+    torch = sys.modules.get("torch")
+    if torch is None or depth < 0:
+        return 0
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, torch.nn.Module):
+        obj.share_memory()
+        return 1
+    if isinstance(obj, dict):
+        children = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        children = obj
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        children = vars(obj).values()
+    else:
+        return 0
+    return sum(_share_torch_memory(child, depth - 1, seen) for child in children)
+
+
+def _phonemize_chunk(texts, output_tokens):
+    if _init_error is not None:
+        raise RuntimeError("The worker's Phonemizer could not be created") from _init_error
+    return _engine.phonemize_batch(texts, output_tokens=output_tokens)
+
+
+class PhonemizerPool:
+    """
+    A pool of worker processes, each holding its own warmed Phonemizer for the lifetime of the pool.
+    """
+
+    def __init__(self, processes=None, languages=("en",), threads_per_worker=1, start_method="spawn",
+                 **phonemizer_kwargs):
+        """
+        Start the workers.
+
+        :param processes: Number of worker processes, defaults to the number of CPUs
+        :param languages: Language IDs whose phonemizers are loaded in every worker before it takes work
+        :param threads_per_worker: Cap on torch/BLAS threads per worker, None leaves the defaults untouched
+        :param start_method: multiprocessing start method, "spawn" is the safe choice with torch loaded
+        :param phonemizer_kwargs: Passed on to ``VoPho.engine.Phonemizer`` in every worker
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.languages = tuple(languages)
+        context = multiprocessing.get_context(start_method)
+
+        initargs = (phonemizer_kwargs, self.languages, threads_per_worker)
+        if threads_per_worker:
+            with _thread_env(threads_per_worker):
+                self._pool = context.Pool(self.processes, initializer=_init_worker, initargs=initargs)
+        else:
+            self._pool = context.Pool(self.processes, initializer=_init_worker, initargs=initargs)
+
+    def imap(self, texts, output_tokens=False, batch_size=32, max_pending=None):
+        """
+        Phonemize an iterable of texts, yielding results in input order.
+
+        The input is consumed lazily, at most ``max_pending`` batches are in flight at any time.
+
+        :param texts: An iterable of input texts
+        :param output_tokens: If True, each result is a tuple of the phonemized string and a list of tokens
+        :param batch_size: Number of texts sent to a worker at once
+        :param max_pending: Maximum number of batches queued or running, defaults to twice the worker count
+        :return: A generator of results, one per input text
+        """
+        max_pending = max_pending or self.processes * 2
+        pending = deque()
+
+        for chunk in chunked(texts, batch_size):
+            pending.append(self._pool.apply_async(_phonemize_chunk, (chunk, output_tokens)))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().get()
+
+        while pending:
+            yield from pending.popleft().get()
+
+    def map(self, texts, output_tokens=False, batch_size=32):
+        """
+        Phonemize a list of texts and return all results at once.
+        """
+        return list(self.imap(texts, output_tokens=output_tokens, batch_size=batch_size))
+
+    def close(self):
+        """
+        Wait for outstanding work and shut the workers down.
+        """
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        """
+        Stop the workers immediately.
+        """
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+class PreforkPhonemizerPool(PhonemizerPool):
+    """
+    A pool of forked worker processes that inherit one Phonemizer loaded by the parent.
+
+    The parent builds and warms the Phonemizer, moves torch weights into shared memory and freezes the garbage
+    collector's view of every object so far (``gc.freeze()``), then forks. Workers share the model pages with
+    the parent copy-on-write instead of each loading their own copy, so RAM grows far slower with the worker
+    count than with :class:`PhonemizerPool`. Only available where the "fork" start method is (not Windows).
+    """
+
+    def __init__(self, processes=None, languages=("en",), threads_per_worker=1, **phonemizer_kwargs):
+        """
+        Load the Phonemizer and fork the workers.
+
+        :param processes: Number of worker processes, defaults to the number of CPUs
+        :param languages: Language IDs whose phonemizers are loaded in the parent before forking
+        :param threads_per_worker: Cap on torch/BLAS threads per worker, None leaves the defaults untouched
+        :param phonemizer_kwargs: Passed on to ``VoPho.engine.Phonemizer``
+        """
+        global _engine, _init_error
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise ValueError("PreforkPhonemizerPool needs the 'fork' start method, use PhonemizerPool instead")
+
+        self.processes = processes or os.cpu_count() or 1
+        self.languages = tuple(languages)
+
+        from .engine import Phonemizer
+
+        self.engine = Phonemizer(preload=self.languages, **phonemizer_kwargs)
+        # Torch modules moved to shared memory, per backend
+        self.shared_modules = {}
+        seen = set()
+        for key, backend in self.engine._loaded_backends():
+            shared = _share_torch_memory(backend, seen=seen)
+            self.shared_modules[key] = self.shared_modules.get(key, 0) + shared
+        for key, shared in self.shared_modules.items():
+            logger.info("Shared %d torch modules of the '%s' backend with the workers", shared, key)
+
+        # Workers find the engine in the module globals they inherit
+        _engine, _init_error = self.engine, None
+        gc.collect()
+        gc.freeze()
+        context = multiprocessing.get_context("fork")
+        self._pool = context.Pool(self.processes, initializer=_init_forked_worker, initargs=(threads_per_worker,))
@@ -0,0 +1,278 @@
+"""
+A local HTTP phonemization server that batches concurrent requests.
+
+    vopho-server --port 8080 --preload en ja --window-ms 5
+
+    POST /phonemize  {"text": "hello", "priority": "interactive"}  ->  {"phonemes": "...", "tokens": [...]}
+    POST /phonemize  {"texts": ["hello", "世界"]}                   ->  {"results": [{"phonemes": ..., "tokens": ...}]}
+    GET  /health                                                   ->  {"status": "ok", "loaded": ["en", "ja"], ...}
+"""
+import argparse
+import itertools
+import json
+import math
+import queue
+import threading
+import warnings
+from concurrent.futures import Future
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic
+
+# Priority classes, lower values are batched first
+PRIORITIES = {
+    "interactive": 0,
+    "default": 1,
+    "batch": 2,
+}
+
+# Share of the queue each priority class may fill before its requests are turned away
+ADMISSION_LIMITS = {
+    "interactive": 1.0,
+    "default": 0.75,
+    "batch": 0.5,
+}
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is not admitted because the queue is full for its priority class.
+    """
+
+
+class MicroBatcher:
+    """
+    Collects requests for a short window and phonemizes them together with ``phonemize_batch``.
+
+    A single thread owns the engine, so the engine is never entered concurrently.
+    """
+
+    def __init__(self, engine, window_ms=5.0, max_batch_size=64, max_queue=1024):
+        """
+        :param engine: A ``VoPho.engine.Phonemizer``
+        :param window_ms: How long to wait for more requests after the first one of a batch arrives
+        :param max_batch_size: Maximum number of texts per batch
+        :param max_queue: Maximum number of queued texts, see ``ADMISSION_LIMITS``
+        """
+        self.engine = engine
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_queue = max_queue
+        self.batches = 0
+        self.rejected = 0
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread = threading.Thread(target=self._run, name="vopho-batcher", daemon=True)
+        self._thread.start()
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def submit(self, text, priority="default"):
+        """
+        Queue a text for phonemization.
+
+        :param text: The input text
+        :param priority: One of ``PRIORITIES``
+        :return: A Future resolving to the phonemized string and list of tokens
+        """
+        return self.submit_many([text], priority)[0]
+
+    def submit_many(self, texts, priority="default"):
+        """
+        Queue several texts, either all of them or, if the queue has no room for all of them, none.
+
+        :param texts: A list of input texts
+        :param priority: One of ``PRIORITIES``
+        :return: A list of Futures, see :meth:`submit`
+        """
+        for text in texts:
+            if not isinstance(text, str):
+                raise TypeError(f"Expected a string, got {type(text).__name__}")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {', '.join(PRIORITIES)}")
+        if self._queue.qsize() + len(texts) > math.ceil(self.max_queue * ADMISSION_LIMITS[priority]):
+            self.rejected += 1
+            raise Overloaded(f"Queue is full for priority '{priority}'")
+
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((PRIORITIES[priority], next(self._sequence), text, future))
+            futures.append(future)
+        return futures
+
+    def close(self):
+        """
+        Finish the queued requests and stop the batching thread.
+        """
+        self._queue.put((float("inf"), next(self._sequence), None, None))
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item[3] is None:
+                return
+            batch = [item]
+
+            deadline = monotonic() + self.window
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item[3] is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch):
+        futures = [future for _, _, _, future in batch if future.set_running_or_notify_cancel()]
+        texts = [text for _, _, text, future in batch if future in futures]
+        if not texts:
+            return
+        self.batches += 1
+        try:
+            results = self.engine.phonemize_batch(texts, output_tokens=True)
+        except Exception as error:
+            for future in futures:
+                future.set_exception(error)
+        else:
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+
+def _result_json(result):
+    phonemes, tokens = result
+    return {"phonemes": phonemes, "tokens": [asdict(token) for token in tokens]}
+
+
+class PhonemizeHandler(BaseHTTPRequestHandler):
+    batcher = None
+    request_timeout = 30.0
+
+    def _send(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send(404, {"error": "not found"})
+            return
+        engine = self.batcher.engine
+        self._send(200, {
+            "status": "ok",
+            "loaded": engine.loaded_languages(),
+            "backends": engine.backend_info(),
+            "queue": self.batcher.qsize(),
+            "batches": self.batcher.batches,
+            "rejected": self.batcher.rejected,
+        })
+
+    def do_POST(self):
+        if self.path != "/phonemize":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not isinstance(body, dict):
+                raise TypeError("Expected a JSON object")
+            priority = body.get("priority", "default")
+            if "texts" in body:
+                texts = body["texts"]
+                if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                    raise TypeError("'texts' must be a list of strings")
+                futures = self.batcher.submit_many(texts, priority)
+            else:
+                futures = [self.batcher.submit(body["text"], priority)]
+        except Overloaded as error:
+            self._send(503, {"error": str(error)})
+            return
+        except (ValueError, KeyError, TypeError) as error:
+            self._send(400, {"error": f"bad request: {error}"})
+            return
+
+        try:
+            results = [_result_json(future.result(timeout=self.request_timeout)) for future in futures]
+        except Exception as error:
+            self._send(500, {"error": str(error)})
+            return
+        self._send(200, {"results": results} if "texts" in body else results[0])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(engine, host="127.0.0.1", port=8080, window_ms=5.0, max_batch_size=64, max_queue=1024,
+                  request_timeout=30.0):
+    """
+    Create a threaded HTTP server in front of a MicroBatcher, call ``serve_forever()`` on it to start serving.
+
+    :return: The server, its batcher is available as ``server.batcher``
+    """
+    batcher = MicroBatcher(engine, window_ms=window_ms, max_batch_size=max_batch_size, max_queue=max_queue)
+    handler = type("Handler", (PhonemizeHandler,), {"batcher": batcher, "request_timeout": request_timeout})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.batcher = batcher
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="vopho-server", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--window-ms", type=float, default=5.0, help="How long to collect requests into a batch")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-queue", type=int, default=1024, help="Queued texts before requests are rejected")
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--preload", nargs="*", default=["en"], metavar="LANG",
+                        help="Languages to load before accepting requests")
+    parser.add_argument("--stress", action="store_true")
+    parser.add_argument("--legacy", action="store_true")
+    parser.add_argument("--cache-size", type=int, default=0)
+    parser.add_argument("--cache-path")
+    parser.add_argument("--detect-languages", nargs="+", metavar="LANG",
+                        help="Languages the detector chooses between for Latin text, 'all' for every language")
+    parser.add_argument("--low-accuracy-detection", action="store_true")
+    parser.add_argument("--preload-detection-models", action="store_true",
+                        help="Load all language detection models before accepting requests")
+    parser.add_argument("--detection-snapshot", help="Word language detections to start with")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+    from .engine import Phonemizer
+
+    engine = Phonemizer(stress=args.stress, legacy=args.legacy, cache_size=args.cache_size,
+                        cache_path=args.cache_path, preload=args.preload,
+                        detection_languages="all" if args.detect_languages == ["all"] else args.detect_languages,
+                        low_accuracy_detection=args.low_accuracy_detection,
+                        preload_detection_models=args.preload_detection_models,
+                        detection_snapshot=args.detection_snapshot)
+    server = create_server(engine, host=args.host, port=args.port, window_ms=args.window_ms,
+                           max_batch_size=args.max_batch_size, max_queue=args.max_queue,
+                           request_timeout=args.request_timeout)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+
+
+if __name__ == "__main__":
+    main()
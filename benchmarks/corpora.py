@@ -0,0 +1,53 @@
+# Fixed benchmark corpora, do not edit existing entries or results stop being comparable between releases
+
+CORPORA = {
+    'en': [
+        "The quick brown fox jumps over the lazy dog.",
+        "Just because I read the script doesn't mean I know how to read!",
+        "She sells sea shells by the sea shore, and the shells she sells are surely seashells.",
+        "Please call Stella and ask her to bring these things with her from the store.",
+        "The lead singer will lead the band, but the pipes are made of lead.",
+        "In 1984, the company shipped over 2,000 units to 15 countries.",
+        "Wind the clock before the wind picks up tonight.",
+        "Could you record the record for me before Tuesday?",
+    ],
+    'ja': [
+        "音素のテストを行うことは、発音の理解を深めるために重要です。",
+        "今日はとても良い天気ですね。",
+        "東京駅から新幹線で大阪へ向かいます。",
+        "この本はとても面白かったので、友達にも勧めました。",
+        "明日の会議は午後三時から始まります。",
+        "私は毎朝コーヒーを飲みながらニュースを読みます。",
+    ],
+    'zh': [
+        "你好，很高兴认识你。",
+        "今天天气很好，我们去公园散步吧。",
+        "这本书非常有意思，我已经读了三遍。",
+        "北京是中国的首都，有很多历史悠久的名胜古迹。",
+        "我每天早上七点起床，然后去上班。",
+        "学习一门新的语言需要耐心和坚持。",
+    ],
+    'cy': [
+        "На улице сегодня холодно и пасмурно.",
+        "Привет, как у тебя дела?",
+        "Москва является столицей России.",
+        "Я люблю читать книги по вечерам.",
+        "Завтра мы поедем на дачу к бабушке.",
+        "Эта задача оказалась сложнее, чем мы думали.",
+    ],
+    'th': [
+        "สวัสดีครับ ยินดีที่ได้รู้จัก",
+        "วันนี้อากาศดีมาก",
+        "กรุงเทพมหานครเป็นเมืองหลวงของประเทศไทย",
+        "ฉันชอบกินอาหารไทย",
+        "พรุ่งนี้เราจะไปเที่ยวทะเล",
+    ],
+    'mixed': [
+        "hello, 你好は中国語でこんにちはと言う意味をしています。Привет!",
+        "На улице сегодня холодно и пасмурно. after all it's pretty cool. はその名の通りのデ",
+        "<phoneme>aɪ səˈpoʊz</phoneme>, don't take my word for it though. 音素のテストを行うことは重要です。",
+        "The word 你好 means hello, and Спасибо means thank you.",
+        "สวัสดีครับ, my name is Somchai. 私はタイから来ました。",
+        "Meeting at 3pm: 会議室A, then 晚饭 with the team!",
+    ],
+}
@@ -0,0 +1,171 @@
+"""
+Benchmark VoPho stage by stage and print the results as JSON.
+
+    python benchmarks/run_benchmarks.py --languages en ja --repeat 5 --output results.json
+
+Reported stages:
+  - cold_start: import, engine construction, first and warm call per corpus, each in a fresh process
+  - tokenize: Tokenizer.tokenize over each corpus
+  - detect: Tokenizer.detect_language over the Latin words of the corpora, with the detection cache off
+  - detect_cached: the same words through a warm detection cache
+  - backend: each language backend's phonemize over the segments of its corpus
+  - end_to_end: Phonemizer.phonemize over each corpus
+"""
+import argparse
+import json
+import math
+import platform
+import re
+import subprocess
+import sys
+import warnings
+from time import perf_counter
+
+from corpora import CORPORA
+
+COLD_START_SCRIPT = """
+import json, sys, warnings
+from time import perf_counter
+warnings.simplefilter("ignore")
+text = sys.argv[1]
+start = perf_counter()
+from VoPho.engine import Phonemizer
+imported = perf_counter()
+engine = Phonemizer()
+created = perf_counter()
+engine.phonemize(text)
+first = perf_counter()
+engine.phonemize(text)
+second = perf_counter()
+print(json.dumps({"import_s": imported - start, "construct_s": created - imported,
+                  "first_call_s": first - created, "warm_call_s": second - first}))
+"""
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(q / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def summarize(latencies, chars):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "calls": len(latencies),
+        "total_s": total,
+        "calls_per_s": len(latencies) / total if total else 0.0,
+        "chars_per_s": chars / total if total else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def time_calls(function, inputs, repeat):
+    latencies = []
+    chars = 0
+    for _ in range(repeat):
+        for item in inputs:
+            start = perf_counter()
+            function(item)
+            latencies.append(perf_counter() - start)
+            chars += len(item)
+    return summarize(latencies, chars)
+
+
+def bench_cold_start(languages):
+    results = {}
+    for lang in languages:
+        output = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT, CORPORA[lang][0]],
+                                capture_output=True, text=True, check=True).stdout
+        results[lang] = json.loads(output.strip().splitlines()[-1])
+    return results
+
+
+def bench_tokenize(engine, languages, repeat):
+    return {lang: time_calls(engine.Tokenizer.tokenize, CORPORA[lang], repeat) for lang in languages}
+
+
+def detection_words():
+    return [word for lang in ('en', 'mixed') for text in CORPORA[lang] for word in re.findall(r"[A-Za-z']+", text)]
+
+
+def bench_detect(engine, repeat):
+    return time_calls(engine.Tokenizer.detect_language, detection_words(), repeat)
+
+
+def bench_detect_cached(engine, repeat):
+    from VoPho.langtokenizers.multicoded import Tokenizer
+
+    # Shares the engine's detector, only the cache in front of it differs
+    tokenizer = Tokenizer(languages=engine.Tokenizer.detection_languages, low_accuracy=engine.Tokenizer.low_accuracy)
+    tokenizer.detector = engine.Tokenizer.detector
+    words = detection_words()
+    for word in words:
+        tokenizer.detect_language(word)
+    return time_calls(tokenizer.detect_language, words, repeat)
+
+
+def bench_backend(engine, languages, repeat):
+    results = {}
+    for lang in languages:
+        if lang == 'mixed':
+            continue
+        segments = [item["text"] for text in CORPORA[lang]
+                    for item in engine.seperate_languages(text) if item["lang"] == lang]
+        backend = engine.get_phonemizer(lang)
+        backend.phonemize(segments[0])  # Load models outside the measurement
+        results[lang] = time_calls(backend.phonemize, segments, repeat)
+    return results
+
+
+def bench_end_to_end(engine, languages, repeat):
+    return {lang: time_calls(engine.phonemize, CORPORA[lang], repeat) for lang in languages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--languages", nargs="+", default=list(CORPORA), choices=list(CORPORA))
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over each corpus per stage")
+    parser.add_argument("--skip-cold-start", action="store_true", help="Do not spawn fresh processes")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    from VoPho.cache import backend_fingerprint
+    from VoPho.engine import Phonemizer
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backends": {lang: backend_fingerprint(lang) for lang in args.languages if lang != 'mixed'},
+        },
+        "repeat": args.repeat,
+    }
+    if not args.skip_cold_start:
+        report["cold_start"] = bench_cold_start(args.languages)
+
+    # Without the detection cache, or every stage after the first pass would only measure cache lookups
+    engine = Phonemizer(detection_cache_size=0)
+    # The end-to-end pass also loads every backend, so the stages after it measure warm latency
+    report["end_to_end_first_pass"] = bench_end_to_end(engine, args.languages, 1)
+    report["tokenize"] = bench_tokenize(engine, args.languages, args.repeat)
+    report["detect"] = bench_detect(engine, args.repeat)
+    report["detect_cached"] = bench_detect_cached(engine, args.repeat)
+    report["backend"] = bench_backend(engine, args.languages, args.repeat)
+    report["end_to_end"] = bench_end_to_end(engine, args.languages, args.repeat)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()